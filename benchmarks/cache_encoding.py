@@ -0,0 +1,100 @@
+"""
+Size, decode time and Redis memory per cached group for each serializer and layout.
+
+Decode time is measured without Redis. Memory is measured with MEMORY USAGE when --redis-url is set,
+test keys are deleted after run:
+    python -m benchmarks.cache_encoding --groups 100000 --redis-url redis://localhost:6379/15
+
+Buckets are kept in listpack encoding only while entries are shorter than hash-max-listpack-value
+of Redis config (64 bytes by default).
+"""
+import argparse
+import json
+import os
+import time
+
+import django
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.core.exceptions import ImproperlyConfigured  # noqa: E402
+
+from benchmarks.vk_stub import fake_group  # noqa: E402
+from vk_integration.serializers import SERIALIZERS, decode_group, encode_group, get_serializer  # noqa: E402
+from vk_integration.shemas import VkGroupSchema  # noqa: E402
+
+
+KEY_PREFIX = 'bench:vk_groups'
+
+
+def make_groups(count: int) -> list[VkGroupSchema]:
+    return [VkGroupSchema.from_response(fake_group(group_id)) for group_id in range(1, count + 1)]
+
+
+def measure_decode(encoded: list[bytes]) -> float:
+    started = time.perf_counter()
+    for data in encoded:
+        decode_group(data)
+    return (time.perf_counter() - started) / len(encoded)
+
+
+def measure_memory(redis_client, encoded: dict[int, bytes], bucket_size: int) -> float:
+    """Memory usage in bytes per group."""
+    keys = set()
+    pipe = redis_client.pipeline(transaction=False)
+    for group_id, data in encoded.items():
+        if bucket_size:
+            bucket, field = divmod(group_id, bucket_size)
+            key = f'{KEY_PREFIX}:{bucket}'
+        else:
+            key, field = KEY_PREFIX, group_id
+        keys.add(key)
+        pipe.hset(key, field, data)
+    pipe.execute()
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key, samples=0)
+        total = sum(pipe.execute())
+    finally:
+        redis_client.delete(*keys)
+    return total / len(encoded)
+
+
+def main(groups_count: int, bucket_sizes: list[int], redis_url: str | None):
+    redis_client = None
+    if redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(redis_url)
+
+    groups = make_groups(groups_count)
+    results = {}
+    for name in SERIALIZERS:
+        try:
+            serializer = get_serializer(name)
+        except ImproperlyConfigured as exc:
+            results[name] = {'skipped': str(exc)}
+            continue
+        encoded = {group.id: encode_group(group, serializer) for group in groups}
+        result = dict(
+            entry_bytes=round(sum(len(data) for data in encoded.values()) / len(encoded), 1),
+            decode_us=round(measure_decode(list(encoded.values())) * 10 ** 6, 3),
+        )
+        if redis_client is not None:
+            for bucket_size in bucket_sizes:
+                result[f'redis_bytes_bucket_{bucket_size}'] = round(
+                    measure_memory(redis_client, encoded, bucket_size), 1
+                )
+        results[name] = result
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--groups', type=int, default=100000)
+    parser.add_argument('--bucket-sizes', type=int, nargs='+', default=[0, 100])
+    parser.add_argument('--redis-url', default=None)
+    args = parser.parse_args()
+    main(args.groups, args.bucket_sizes, args.redis_url)
@@ -0,0 +1,94 @@
+"""
+Per-request overhead of database access from event loop: Django async ORM vs psycopg 3 async pool.
+
+Needs database from settings and psycopg with pool extra, test groups are created in a separate id range
+and deleted after run:
+    python -m benchmarks.db_async --requests 5000 --concurrency 20 --batch-size 500 --rounds 20
+
+Lookups are done by VkGroupDbProvider with VK_GROUP_ASYNC_DB_ENABLED switched off and on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import django
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+
+from benchmarks.utils import summarize  # noqa: E402
+from vk_integration.db import close_db_pool  # noqa: E402
+from vk_integration.models import VkGroup  # noqa: E402
+from vk_integration.services import VkGroupDbProvider  # noqa: E402
+from vk_integration.shemas import VkGroupSchema  # noqa: E402
+
+
+FIRST_ID = 10 ** 15
+GROUPS_COUNT = 1000
+
+
+def make_groups(count: int, round_num: int) -> list[VkGroupSchema]:
+    return [
+        VkGroupSchema(id=FIRST_ID + i, name=f'Group {i} round {round_num}', users_count=i + round_num)
+        for i in range(count)
+    ]
+
+
+async def run_lookups(requests: int, concurrency: int) -> dict:
+    provider = VkGroupDbProvider()
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _get(group_id: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await provider.get_by_id(group_id)
+            latencies.append(time.perf_counter() - started)
+
+    group_ids = [FIRST_ID + random.randrange(GROUPS_COUNT) for _ in range(requests)]
+    started = time.perf_counter()
+    await asyncio.gather(*[_get(group_id) for group_id in group_ids])
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def run_upserts(batch_size: int, rounds: int) -> dict:
+    provider = VkGroupDbProvider()
+    latencies = []
+    started = time.perf_counter()
+    for round_num in range(rounds):
+        groups = make_groups(batch_size, round_num)
+        round_started = time.perf_counter()
+        await provider.bulk_upsert(groups)
+        latencies.append(time.perf_counter() - round_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def main(args):
+    results = {}
+    try:
+        await VkGroupDbProvider().bulk_upsert(make_groups(GROUPS_COUNT, -1))
+        for name, async_db_enabled in [('django_orm', False), ('psycopg_pool', True)]:
+            settings.VK_GROUP_ASYNC_DB_ENABLED = async_db_enabled
+            results[name] = dict(
+                lookups=await run_lookups(args.requests, args.concurrency),
+                upserts=await run_upserts(args.batch_size, args.rounds),
+            )
+    finally:
+        await VkGroup.objects.filter(id__gte=FIRST_ID).adelete()
+        await close_db_pool()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""
+Time of writing refresh batch to database with different approaches.
+
+Needs database from settings, test groups are created in a separate id range and deleted after run:
+    python -m benchmarks.db_upsert --batch-size 500 --rounds 20
+"""
+import argparse
+import io
+import json
+import os
+import time
+
+import django
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from benchmarks.utils import summarize  # noqa: E402
+from vk_integration.models import VkGroup  # noqa: E402
+
+
+FIRST_ID = 10 ** 15
+
+
+def make_groups(batch_size: int, round_num: int) -> list[VkGroup]:
+    now = timezone.now()
+    return [
+        VkGroup(id=FIRST_ID + i, name=f'Group {i} round {round_num}', users_count=i + round_num, updated_at=now)
+        for i in range(batch_size)
+    ]
+
+
+def bulk_update(groups: list[VkGroup]):
+    VkGroup.objects.bulk_update(groups, ['name', 'users_count', 'updated_at'])
+
+
+def bulk_create_upsert(groups: list[VkGroup]):
+    VkGroup.objects.bulk_create(
+        groups,
+        update_conflicts=True,
+        unique_fields=['id'],
+        update_fields=['name', 'users_count', 'updated_at'],
+    )
+
+
+def copy_upsert(groups: list[VkGroup]):
+    table = VkGroup._meta.db_table
+    now = timezone.now().isoformat()
+    buffer = io.StringIO()
+    for group in groups:
+        name = group.name.replace('\\', '\\\\').replace('\t', ' ').replace('\n', ' ')
+        buffer.write(f'{group.id}\t{name}\t{group.users_count}\n')
+    buffer.seek(0)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS vk_group_upsert (id bigint, name varchar(264), users_count bigint) '
+            'ON COMMIT DELETE ROWS'
+        )
+        cursor.copy_expert('COPY vk_group_upsert (id, name, users_count) FROM STDIN', buffer)
+        cursor.execute(
+            f'INSERT INTO {table} (id, name, users_count, created_at, updated_at) '
+            'SELECT id, name, users_count, %s, %s FROM vk_group_upsert '
+            'ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, users_count = EXCLUDED.users_count, '
+            'updated_at = EXCLUDED.updated_at',
+            [now, now],
+        )
+
+
+def run(approach, batch_size: int, rounds: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for round_num in range(rounds):
+        groups = make_groups(batch_size, round_num)
+        round_started = time.perf_counter()
+        approach(groups)
+        latencies.append(time.perf_counter() - round_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def main(batch_size: int, rounds: int):
+    results = {}
+    try:
+        VkGroup.objects.bulk_create(make_groups(batch_size, -1), ignore_conflicts=True)
+        for approach in [bulk_update, bulk_create_upsert, copy_upsert]:
+            results[approach.__name__] = run(approach, batch_size, rounds)
+    finally:
+        VkGroup.objects.filter(id__gte=FIRST_ID).delete()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    main(args.batch_size, args.rounds)
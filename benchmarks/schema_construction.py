@@ -0,0 +1,92 @@
+"""
+CPU time of building groups with pydantic validation vs trusted construction and columnar batches.
+
+Runs without database and Redis:
+    python -m benchmarks.schema_construction --lookups 100000 --batches 200
+
+Per lookup: group decoded from cache entry and group built from database row.
+Per batch: refresh batch of VK response turned into data for upsert, with schemas and models per group
+or with columnar VkGroupBatch.
+"""
+import argparse
+import json
+import os
+import time
+
+import django
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from benchmarks.vk_stub import fake_group  # noqa: E402
+from vk_integration.models import VkGroup  # noqa: E402
+from vk_integration.serializers import JsonGroupSerializer, decode_group, encode_group  # noqa: E402
+from vk_integration.shemas import VkGroupBatch, VkGroupSchema  # noqa: E402
+
+
+def cpu_time_per_call(func, args_list: list) -> float:
+    """CPU microseconds per call."""
+    started = time.process_time()
+    for args in args_list:
+        func(*args)
+    return round((time.process_time() - started) / len(args_list) * 10 ** 6, 3)
+
+
+def decode_validated(data: bytes) -> VkGroupSchema:
+    return VkGroupSchema(**json.loads(data[1:]))
+
+
+def row_validated(group_id: int, name: str, users_count: int) -> VkGroupSchema:
+    return VkGroupSchema(id=group_id, name=name, users_count=users_count)
+
+
+def row_trusted(group_id: int, name: str, users_count: int) -> VkGroupSchema:
+    return VkGroupSchema.trusted(id=group_id, name=name, users_count=users_count)
+
+
+def batch_with_objects(groups_data: list[dict]) -> list[VkGroup]:
+    now = timezone.now()
+    schemas = [VkGroupSchema.from_response(group_data) for group_data in groups_data]
+    return [VkGroup(**dict(schema), content_hash=schema.content_hash(), updated_at=now) for schema in schemas]
+
+
+def batch_columnar(groups_data: list[dict]) -> tuple:
+    batch = VkGroupBatch.from_response(groups_data)
+    return batch.ids.tolist(), batch.names, batch.users_counts.tolist(), batch.content_hashes()
+
+
+def main(lookups: int, batches: int):
+    serializer = JsonGroupSerializer()
+    groups = [VkGroupSchema.from_response(fake_group(group_id)) for group_id in range(1, lookups + 1)]
+    entries = [(encode_group(group, serializer),) for group in groups]
+    rows = [(group.id, group.name, group.users_count) for group in groups]
+    batch_size = settings.VK_MAX_GROUP_UPDATE_SIZE
+    responses = [
+        ([fake_group(batch_num * batch_size + i) for i in range(batch_size)],)
+        for batch_num in range(batches)
+    ]
+    results = dict(
+        lookup_us=dict(
+            cache_entry_validated=cpu_time_per_call(decode_validated, entries),
+            cache_entry_trusted=cpu_time_per_call(decode_group, entries),
+            db_row_validated=cpu_time_per_call(row_validated, rows),
+            db_row_trusted=cpu_time_per_call(row_trusted, rows),
+        ),
+        batch_us=dict(
+            schemas_and_models=cpu_time_per_call(batch_with_objects, responses),
+            columnar=cpu_time_per_call(batch_columnar, responses),
+        ),
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--batches', type=int, default=200)
+    args = parser.parse_args()
+    main(args.lookups, args.batches)
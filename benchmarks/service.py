@@ -0,0 +1,207 @@
+"""
+End-to-end benchmark of group lookups and refresh against local VK API stub.
+
+Requests go through the whole Django stack in process, with database and Redis from settings:
+    python -m benchmarks.service --groups 1000 --requests 5000 --concurrency 50 --output results.json
+
+Scenarios:
+    all_miss - every request fetches new group from VK stub
+    all_hit - every request gets group cached by all_miss
+    zipf - ids drawn from Zipf distribution over groups, first reads miss and later reads hit
+    refresh_batch, refresh_chunk - update of all benchmark groups by update_vk_groups_batch
+        and update_vk_groups_chunk, latency is per VK batch or chunk
+    vk_outage - VK stub fails every request, groups older than hard TTL are served stale from database
+
+Benchmark groups get ids from --id-offset, they are deleted from database and Redis after run.
+VK API rate limiter is disabled unless --keep-rate-limit is set.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import timedelta
+
+import aiohttp
+import django
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from asgiref.sync import sync_to_async  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.test import AsyncClient  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from benchmarks.utils import summarize  # noqa: E402
+from benchmarks.vk_stub import start_stub  # noqa: E402
+from vk_integration import lifespan  # noqa: E402
+from vk_integration.access_tracking import HOTNESS_KEY  # noqa: E402
+from vk_integration.models import VkGroup  # noqa: E402
+from vk_integration.redis_pool import get_redis  # noqa: E402
+from vk_integration.services import (  # noqa: E402
+    VkGroupLocalProvider, VkGroupRedisProvider, get_vk_api, update_vk_groups_batch, update_vk_groups_chunk,
+    vk_api_circuit_breaker
+)
+
+
+LOOKUP_SCENARIOS = ('all_miss', 'all_hit', 'zipf', 'vk_outage')
+
+
+def zipf_ids(group_ids: list[int], count: int, exponent: float) -> list[int]:
+    """Ids drawn with probability of k-th id proportional to 1 / k ** exponent."""
+    weights = [1 / rank ** exponent for rank in range(1, len(group_ids) + 1)]
+    return random.choices(group_ids, weights=weights, k=count)
+
+
+async def run_requests(client: AsyncClient, group_ids: list[int], concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    stale = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _get(group_id: int):
+        nonlocal errors, stale
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(f'/vk/group/{group_id}/')
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+            elif response.has_header('X-Cache-Stale'):
+                stale += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[_get(group_id) for group_id in group_ids])
+    return dict(summarize(latencies, time.perf_counter() - started), errors=errors, stale=stale)
+
+
+async def run_refresh(update, batches: list[list[int]]) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for group_ids in batches:
+        batch_started = time.perf_counter()
+        await update(group_ids)
+        latencies.append(time.perf_counter() - batch_started)
+    elapsed = time.perf_counter() - started
+    groups_count = sum(len(group_ids) for group_ids in batches)
+    return dict(summarize(latencies, elapsed), groups_per_second=round(groups_count / elapsed, 1))
+
+
+async def set_stub_faults(base_url: str, **faults):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(base_url.replace('/method', '/stub/faults'), json=faults) as resp:
+            resp.raise_for_status()
+
+
+async def clear_caches(group_ids: list[int]):
+    redis_provider = VkGroupRedisProvider()
+    async with get_redis().pipeline(transaction=False) as pipe:
+        for group_id in group_ids:
+            pipe.hdel(*redis_provider._locate(group_id))
+        pipe.zrem(HOTNESS_KEY, *group_ids)
+        await pipe.execute()
+    for group_id in group_ids:
+        VkGroupLocalProvider.cache.delete(group_id)
+
+
+async def cleanup(group_ids: list[int]):
+    await sync_to_async(VkGroup.objects.filter(id__in=group_ids).delete, thread_sensitive=False)()
+    await clear_caches(group_ids)
+
+
+async def main(args):
+    runner, base_url = await start_stub(
+        latency_ms=args.latency_ms, error_rate=args.error_rate, rate_limit=args.stub_rate_limit
+    )
+    api = get_vk_api()
+    api.api_base_url = base_url
+    if not args.keep_rate_limit:
+        api.rate_limiter = None
+
+    # Test client sends Host: testserver, CommonMiddleware rejects it with 400 unless it is allowed
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    client = AsyncClient()
+    group_ids = list(range(args.id_offset, args.id_offset + args.groups))
+    results = dict(
+        options=vars(args),
+        settings=dict(
+            local_cache=settings.VK_GROUP_LOCAL_CACHE_ENABLED,
+            serializer=settings.VK_GROUP_CACHE_SERIALIZER,
+            bucket_size=settings.VK_GROUP_CACHE_BUCKET_SIZE,
+            batch_window_ms=settings.VK_API_BATCH_WINDOW_MS,
+        ),
+    )
+    try:
+        await cleanup(group_ids)
+        results['all_miss'] = await run_requests(client, group_ids, args.concurrency)
+        results['all_hit'] = await run_requests(
+            client, random.choices(group_ids, k=args.requests), args.concurrency
+        )
+
+        await cleanup(group_ids)
+        results['zipf'] = await run_requests(
+            client, zipf_ids(group_ids, args.requests, args.zipf_exponent), args.concurrency
+        )
+
+        batch_size = settings.VK_MAX_GROUP_UPDATE_SIZE
+        results['refresh_batch'] = await run_refresh(
+            update_vk_groups_batch, [group_ids[i:i + batch_size] for i in range(0, len(group_ids), batch_size)]
+        )
+
+        async def _update_chunk(chunk_ids: list[int]):
+            await update_vk_groups_chunk(chunk_ids, concurrency=args.refresh_concurrency, use_execute=args.execute)
+
+        chunk_size = batch_size * args.refresh_concurrency
+        results['refresh_chunk'] = await run_refresh(
+            _update_chunk, [group_ids[i:i + chunk_size] for i in range(0, len(group_ids), chunk_size)]
+        )
+
+        await clear_caches(group_ids)
+        expired_at = timezone.now() - timedelta(seconds=settings.VK_GROUP_CACHE_HARD_TTL_SECONDS + 60)
+        await sync_to_async(
+            VkGroup.objects.filter(id__in=group_ids).update, thread_sensitive=False
+        )(updated_at=expired_at)
+        await set_stub_faults(base_url, error_rate=1)
+        try:
+            results['vk_outage'] = await run_requests(
+                client, random.choices(group_ids, k=args.requests), args.concurrency
+            )
+        finally:
+            await set_stub_faults(base_url, error_rate=args.error_rate)
+            if vk_api_circuit_breaker:
+                vk_api_circuit_breaker.record_success()
+    finally:
+        await cleanup(group_ids)
+        await lifespan.shutdown()
+        await runner.cleanup()
+
+    # Errors are expected only from errors injected in stub, otherwise latencies are of error responses
+    failed = [name for name in LOOKUP_SCENARIOS if results[name]['errors']]
+    if failed and not args.error_rate:
+        raise SystemExit(f'Requests failed in scenarios {", ".join(failed)}: {json.dumps(results, indent=2)}')
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--groups', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--id-offset', type=int, default=2_000_000_000)
+    parser.add_argument('--zipf-exponent', type=float, default=1.1)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--stub-rate-limit', type=int, default=0)
+    parser.add_argument('--keep-rate-limit', action='store_true')
+    parser.add_argument('--refresh-concurrency', type=int, default=4)
+    parser.add_argument('--execute', action='store_true', help='Refresh chunks with VK execute')
+    parser.add_argument('--output', default=None, help='File to write JSON results to')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,27 @@
+import statistics
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    """
+    Summary of benchmark run.
+
+    :param latencies: Latency of each operation in seconds.
+    :param elapsed: Wall time of the run in seconds.
+    """
+    return dict(
+        count=len(latencies),
+        throughput=round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        mean_ms=round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        p50_ms=round(percentile(latencies, 50) * 1000, 3),
+        p95_ms=round(percentile(latencies, 95) * 1000, 3),
+        p99_ms=round(percentile(latencies, 99) * 1000, 3),
+    )
@@ -0,0 +1,70 @@
+"""
+Latency of VkAPI with session per request vs pooled session.
+
+Run:
+    python -m benchmarks.vk_session --requests 2000 --concurrency 20
+
+Stub is served over plain HTTP on localhost, so the difference doesn't include
+TLS handshakes and DNS lookups, which pooled session also saves with real VK API.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from benchmarks.utils import summarize
+from benchmarks.vk_stub import start_stub
+from vk_integration.vk_api import VkAPI
+
+
+class PerRequestSessionVkAPI(VkAPI):
+    """VkAPI opening new session for each request."""
+
+    async def _make_request(self, url, params=None, headers=None, priority=None, data=None):
+        headers = dict(headers or {}, **self._get_auth_headers())
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url, params=params, headers=headers) as resp:
+                response_data = await resp.json()
+        return response_data.get('response')
+
+
+async def run_scenario(api: VkAPI, requests: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _call(group_id: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await api.get_group_info(group_id)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[_call(group_id) for group_id in range(1, requests + 1)])
+    return summarize(latencies, time.perf_counter() - started)
+
+
+async def main(requests: int, concurrency: int, latency_ms: float):
+    runner, base_url = await start_stub(latency_ms=latency_ms)
+    try:
+        results = dict(
+            per_request_session=await run_scenario(
+                PerRequestSessionVkAPI('token', base_url=base_url), requests, concurrency
+            ),
+        )
+        pooled_api = VkAPI('token', base_url=base_url)
+        results['pooled_session'] = await run_scenario(pooled_api, requests, concurrency)
+        await pooled_api.close()
+    finally:
+        await runner.cleanup()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Stub response latency')
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency_ms))
@@ -0,0 +1,136 @@
+"""
+Local stub of VK API for offline benchmarks.
+
+Run standalone:
+    python -m benchmarks.vk_stub --port 8081 --latency-ms 20 --error-rate 0.01 --rate-limit 20
+
+Emulate VK outage while the stub is running:
+    curl -X POST -d '{"error_rate": 1}' http://127.0.0.1:8081/stub/faults
+
+and point the service to it with VK_API_BASE_URL=http://127.0.0.1:8081/method
+"""
+import argparse
+import asyncio
+import random
+import re
+import time
+
+from aiohttp import web
+
+
+def fake_group(group_id: int) -> dict:
+    """Deterministic group data for group id."""
+    return dict(
+        id=group_id,
+        name=f'Group {group_id}',
+        screen_name=f'club{group_id}',
+        members_count=group_id % 1000000,
+    )
+
+
+EXECUTE_CALL_RE = re.compile(r'API\.groups\.getById\(\{"group_ids": "([\d,]*)"')
+
+
+def build_app(latency_ms: float = 0, error_rate: float = 0, rate_limit: int = 0,
+              hang_rate: float = 0, hang_ms: float = 60000) -> web.Application:
+    """
+    Build stub application.
+
+    Faults can be changed while stub is running by POST /stub/faults with JSON object of the same options,
+    e.g. {"error_rate": 1} to emulate VK outage.
+
+    :param latency_ms: Delay before each response in milliseconds.
+    :param error_rate: Share of requests failed with internal server error of VK.
+    :param rate_limit: Max requests per second, exceeding requests get "Too many requests per second" error.
+        0 - no limit.
+    :param hang_rate: Share of requests answered only after hang_ms, to emulate timeouts.
+    :param hang_ms: Delay of hanging requests in milliseconds.
+    """
+    faults = dict(
+        latency_ms=latency_ms, error_rate=error_rate, rate_limit=rate_limit, hang_rate=hang_rate, hang_ms=hang_ms
+    )
+    window = dict(second=0, requests=0)
+
+    async def _apply_faults() -> dict | None:
+        if faults['hang_rate'] and random.random() < faults['hang_rate']:
+            await asyncio.sleep(faults['hang_ms'] / 1000)
+        elif faults['latency_ms']:
+            await asyncio.sleep(faults['latency_ms'] / 1000)
+        if faults['rate_limit']:
+            second = int(time.monotonic())
+            if window['second'] != second:
+                window['second'], window['requests'] = second, 0
+            window['requests'] += 1
+            if window['requests'] > faults['rate_limit']:
+                return {'error': {'error_code': 6, 'error_msg': 'Too many requests per second'}}
+        if faults['error_rate'] and random.random() < faults['error_rate']:
+            return {'error': {'error_code': 10, 'error_msg': 'Internal server error'}}
+        return None
+
+    async def set_faults(request: web.Request) -> web.Response:
+        options = await request.json()
+        unknown = set(options) - set(faults)
+        if unknown:
+            return web.json_response({'error': f'Unknown options {sorted(unknown)}'}, status=400)
+        faults.update(options)
+        return web.json_response(faults)
+
+    async def groups_get_by_id(request: web.Request) -> web.Response:
+        error = await _apply_faults()
+        if error:
+            return web.json_response(error)
+        raw_ids = request.query.get('group_ids') or request.query.get('group_id') or ''
+        group_ids = [int(g_id) for g_id in raw_ids.split(',') if g_id]
+        if not group_ids:
+            return web.json_response({'error': {'error_code': 100, 'error_msg': 'group_ids is undefined'}})
+        return web.json_response({'response': [fake_group(g_id) for g_id in group_ids]})
+
+    async def execute(request: web.Request) -> web.Response:
+        """Execute supporting only code made by VkAPI.get_group_batches_info."""
+        error = await _apply_faults()
+        if error:
+            return web.json_response(error)
+        code = (await request.post()).get('code', '')
+        return web.json_response({'response': [
+            [fake_group(int(g_id)) for g_id in raw_ids.split(',') if g_id]
+            for raw_ids in EXECUTE_CALL_RE.findall(code)
+        ]})
+
+    app = web.Application()
+    app.router.add_get('/method/groups.getById', groups_get_by_id)
+    app.router.add_post('/method/execute', execute)
+    app.router.add_post('/stub/faults', set_faults)
+    return app
+
+
+async def start_stub(host: str = '127.0.0.1', port: int = 0, **app_options) -> tuple[web.AppRunner, str]:
+    """
+    Start stub in the running event loop.
+
+    :return: Runner to cleanup stub and base url for VkAPI.
+    """
+    runner = web.AppRunner(build_app(**app_options), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://{host}:{bound_port}/method'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local VK API stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--rate-limit', type=int, default=0)
+    parser.add_argument('--hang-rate', type=float, default=0)
+    parser.add_argument('--hang-ms', type=float, default=60000)
+    args = parser.parse_args()
+    web.run_app(
+        build_app(
+            latency_ms=args.latency_ms, error_rate=args.error_rate, rate_limit=args.rate_limit,
+            hang_rate=args.hang_rate, hang_ms=args.hang_ms,
+        ),
+        host=args.host, port=args.port, access_log=None,
+    )
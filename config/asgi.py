@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402 Django must be set up first
+
+from vk_integration.fast_path import with_fast_group_path  # noqa: E402
+from vk_integration.lifespan import with_lifespan  # noqa: E402
+
+if settings.VK_GROUP_FAST_PATH_ENABLED:
+    django_application = with_fast_group_path(django_application)
+
+application = with_lifespan(django_application)
@@ -22,11 +22,30 @@ def on_celery_setup_logging(**kwargs):
 app.autodiscover_tasks()
 
 
+# Beat schedule is built on import, so settings modules without refresh settings get their defaults
+if getattr(settings, 'VK_GROUP_REFRESH_CONTINUOUS', True):
+    refresh_schedule = {
+        # Send groups due to refresh at steady rate
+        'drain-vk-groups-refresh-schedule': {
+            'task': 'vk_integration.tasks.drain_vk_groups_refresh_schedule_task',
+            'schedule': getattr(settings, 'VK_GROUP_REFRESH_DRAIN_INTERVAL_SECONDS', 60),
+        },
+    }
+else:
+    refresh_schedule = {
+        # Update stale groups hourly, update intervals depend on how often groups are read
+        'update-vk-groups-hourly': {
+            'task': 'vk_integration.tasks.update_vk_groups_task',
+            'schedule': crontab(minute=0),
+        },
+    }
+
 app.conf.beat_schedule = {
-    # Update groups daily at 00:00
-    'update-vk-groups-daily': {
-        'task': 'vk_integration.tasks.update_vk_groups_task',
-        'schedule': crontab(minute=0, hour=0),
+    **refresh_schedule,
+    # Decay read counts of groups hourly, see VK_GROUP_HOTNESS_DECAY_INTERVAL_SECONDS
+    'decay-vk-groups-hotness-hourly': {
+        'task': 'vk_integration.tasks.decay_vk_groups_hotness_task',
+        'schedule': crontab(minute=30),
     },
 }
 
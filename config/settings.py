@@ -77,9 +77,17 @@ DATABASES = {
     }
 }
 
+# Async-native queries of VkGroup over psycopg 3 pool instead of Django ORM in a thread
+VK_GROUP_ASYNC_DB_ENABLED = env.bool('VK_GROUP_ASYNC_DB_ENABLED', default=False)
+DB_POOL_MIN_SIZE = env.int('DB_POOL_MIN_SIZE', default=1)  # Per event loop
+DB_POOL_MAX_SIZE = env.int('DB_POOL_MAX_SIZE', default=10)
+DB_POOL_TIMEOUT = env.float('DB_POOL_TIMEOUT', default=5)  # Seconds to wait for free connection
+
 
 REDIS_HOST = env.str('REDIS_HOST', 'redis')
 REDIS_PORT = env.str('REDIS_PORT', '6379')
+REDIS_MAX_CONNECTIONS = env.int('REDIS_MAX_CONNECTIONS', default=50)  # Per event loop
+REDIS_POOL_TIMEOUT = env.float('REDIS_POOL_TIMEOUT', default=5)  # Seconds to wait for free connection
 
 CACHES = {
     "default": {
@@ -89,7 +97,12 @@ CACHES = {
             REDIS_PORT,
         ),
         "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient"
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CONNECTION_POOL_CLASS": "redis.BlockingConnectionPool",
+            "CONNECTION_POOL_KWARGS": {
+                "max_connections": REDIS_MAX_CONNECTIONS,
+                "timeout": REDIS_POOL_TIMEOUT,
+            },
         },
         "TIMEOUT": None
     }
@@ -103,6 +116,8 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Port of Prometheus metrics of Celery worker processes, 0 - disabled. Needs PROMETHEUS_MULTIPROC_DIR with prefork pool.
+WORKER_METRICS_PORT = env.int('WORKER_METRICS_PORT', default=0)
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -147,7 +162,87 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 VK_ACCESS_TOKEN = env.str('VK_ACCESS_TOKEN')
 VK_MAX_GROUP_UPDATE_SIZE = 500
+VK_GROUP_UPDATE_DISPATCH_BATCHES = 20  # Batches sent to Celery at once
 VK_GROUP_UPDATE_INTERVAL_SECONDS = 60 * 60 * 24  # Every 24 hours
+VK_GROUP_UPDATE_BUDGET = env.int('VK_GROUP_UPDATE_BUDGET', default=0)  # Max groups updated per run, 0 - no limit
+# Groups per update task fetched with concurrent VK requests, 0 - one batch of VK_MAX_GROUP_UPDATE_SIZE per task
+VK_GROUP_UPDATE_CHUNK_SIZE = env.int('VK_GROUP_UPDATE_CHUNK_SIZE', default=0)
+VK_GROUP_UPDATE_CONCURRENCY = env.int('VK_GROUP_UPDATE_CONCURRENCY', default=4)  # VK requests in flight per task
+VK_GROUP_UPDATE_USE_EXECUTE = env.bool('VK_GROUP_UPDATE_USE_EXECUTE', default=False)  # Pack batches in execute
+
+# Refresh groups continuously from schedule in Redis instead of sweeps of groups not updated for a day
+VK_GROUP_REFRESH_CONTINUOUS = env.bool('VK_GROUP_REFRESH_CONTINUOUS', default=True)
+VK_GROUP_REFRESH_DRAIN_INTERVAL_SECONDS = env.int('VK_GROUP_REFRESH_DRAIN_INTERVAL_SECONDS', default=60)
+VK_GROUP_REFRESH_VK_REQUESTS_PER_SECOND = env.float('VK_GROUP_REFRESH_VK_REQUESTS_PER_SECOND', default=1)
+VK_GROUP_REFRESH_MAX_QUEUE_LENGTH = env.int('VK_GROUP_REFRESH_MAX_QUEUE_LENGTH', default=100)  # Celery tasks
+VK_GROUP_REFRESH_LEASE_SECONDS = env.int('VK_GROUP_REFRESH_LEASE_SECONDS', default=15 * 60)  # Retry after
+VK_GROUP_REFRESH_SEED_BATCH_SIZE = 1000
+
+# Read counts of groups to update often read groups more often and not read groups rarely
+VK_GROUP_ACCESS_TRACKING_ENABLED = env.bool('VK_GROUP_ACCESS_TRACKING_ENABLED', default=True)
+VK_GROUP_ACCESS_FLUSH_INTERVAL_SECONDS = env.float('VK_GROUP_ACCESS_FLUSH_INTERVAL_SECONDS', default=5)
+VK_GROUP_ACCESS_FLUSH_SIZE = env.int('VK_GROUP_ACCESS_FLUSH_SIZE', default=1000)
+VK_GROUP_HOTNESS_HALF_LIFE_SECONDS = env.int('VK_GROUP_HOTNESS_HALF_LIFE_SECONDS', default=60 * 60 * 24)
+VK_GROUP_HOTNESS_MIN_SCORE = env.float('VK_GROUP_HOTNESS_MIN_SCORE', default=0.5)  # Lower scores are dropped
+VK_GROUP_HOT_SCORE = env.float('VK_GROUP_HOT_SCORE', default=100)
+VK_GROUP_HOT_MAX_GROUPS = env.int('VK_GROUP_HOT_MAX_GROUPS', default=10000)
+VK_GROUP_HOT_UPDATE_INTERVAL_SECONDS = env.int('VK_GROUP_HOT_UPDATE_INTERVAL_SECONDS', default=60 * 60)
+# Update interval of groups not read recently, 0 - never update them
+VK_GROUP_COLD_UPDATE_INTERVAL_SECONDS = env.int('VK_GROUP_COLD_UPDATE_INTERVAL_SECONDS', default=60 * 60 * 24 * 7)
+VK_GROUP_HOTNESS_DECAY_INTERVAL_SECONDS = 60 * 60  # Must match decay schedule in beat
+VK_GROUPS_REQUEST_MAX_IDS = env.int('VK_GROUPS_REQUEST_MAX_IDS', default=1000)  # Max ids in one groups request
+
+# Groups cache in Redis
+VK_GROUP_CACHE_SERIALIZER = env.str('VK_GROUP_CACHE_SERIALIZER', default='json')  # json, orjson, msgpack, struct
+# Groups per hash in Redis, 0 to keep all groups in one hash. Keep under hash-max-listpack-entries of Redis.
+VK_GROUP_CACHE_BUCKET_SIZE = env.int('VK_GROUP_CACHE_BUCKET_SIZE', default=0)
+# Group cached longer than soft TTL ago is returned and refreshed in background
+VK_GROUP_CACHE_SOFT_TTL_SECONDS = env.int('VK_GROUP_CACHE_SOFT_TTL_SECONDS', default=VK_GROUP_UPDATE_INTERVAL_SECONDS)
+# Group cached longer than hard TTL ago is refetched, Redis 7.4+ also drops it with hash field expiration
+VK_GROUP_CACHE_HARD_TTL_SECONDS = env.int('VK_GROUP_CACHE_HARD_TTL_SECONDS', default=3 * VK_GROUP_UPDATE_INTERVAL_SECONDS)
+# Load groups from database into cold Redis cache when application starts
+VK_GROUP_CACHE_WARMUP_ON_STARTUP = env.bool('VK_GROUP_CACHE_WARMUP_ON_STARTUP', default=False)
+VK_GROUP_CACHE_WARMUP_BATCH_SIZE = env.int('VK_GROUP_CACHE_WARMUP_BATCH_SIZE', default=1000)
+VK_GROUP_CACHE_WARMUP_LOCK_SECONDS = env.int('VK_GROUP_CACHE_WARMUP_LOCK_SECONDS', default=60 * 60)
+# Seconds to remember groups not found in VK, 0 to disable
+VK_GROUP_NEGATIVE_CACHE_TTL_SECONDS = env.int('VK_GROUP_NEGATIVE_CACHE_TTL_SECONDS', default=300)
+
+# In-process cache of groups in each worker
+VK_GROUP_LOCAL_CACHE_ENABLED = env.bool('VK_GROUP_LOCAL_CACHE_ENABLED', default=True)
+VK_GROUP_LOCAL_CACHE_MAX_ITEMS = env.int('VK_GROUP_LOCAL_CACHE_MAX_ITEMS', default=10000)
+VK_GROUP_LOCAL_CACHE_MAX_BYTES = env.int('VK_GROUP_LOCAL_CACHE_MAX_BYTES', default=16 * 1024 * 1024)
+VK_GROUP_LOCAL_CACHE_TTL_SECONDS = env.float('VK_GROUP_LOCAL_CACHE_TTL_SECONDS', default=60)
+
+# Serve cached groups from ASGI application bypassing Django middlewares and views
+VK_GROUP_FAST_PATH_ENABLED = env.bool('VK_GROUP_FAST_PATH_ENABLED', default=False)
+
+# Cache-Control max-age of group response, hot groups are refreshed that often. 0 - clients revalidate by ETag.
+VK_GROUP_HTTP_MAX_AGE_SECONDS = env.int('VK_GROUP_HTTP_MAX_AGE_SECONDS', default=VK_GROUP_HOT_UPDATE_INTERVAL_SECONDS)
+
+# Lock to fetch missed group from VK by one process at a time
+VK_GROUP_FETCH_LOCK_TIMEOUT_SECONDS = env.float('VK_GROUP_FETCH_LOCK_TIMEOUT_SECONDS', default=15)
+VK_GROUP_FETCH_LOCK_WAIT_SECONDS = env.float('VK_GROUP_FETCH_LOCK_WAIT_SECONDS', default=5)
+
+# Batching of group lookups from VK, 0 window to request each group separately
+VK_API_BATCH_WINDOW_MS = env.float('VK_API_BATCH_WINDOW_MS', default=10)
+VK_API_BATCH_MAX_SIZE = env.int('VK_API_BATCH_MAX_SIZE', default=100)
+
+VK_API_BASE_URL = env.str('VK_API_BASE_URL', default='https://api.vk.com/method')
+VK_API_CONNECTION_LIMIT = env.int('VK_API_CONNECTION_LIMIT', default=100)  # Per event loop
+VK_API_CONNECTION_LIMIT_PER_HOST = env.int('VK_API_CONNECTION_LIMIT_PER_HOST', default=20)
+VK_API_KEEPALIVE_TIMEOUT = env.float('VK_API_KEEPALIVE_TIMEOUT', default=30)
+VK_API_TIMEOUT = env.float('VK_API_TIMEOUT', default=10)
+VK_API_INTERACTIVE_TIMEOUT = env.float('VK_API_INTERACTIVE_TIMEOUT', default=3)  # For request of user, 0 - as total
+# Failures of VK API in a row to stop requests for VK_API_CIRCUIT_RECOVERY_SECONDS, 0 - no circuit breaker
+VK_API_CIRCUIT_FAILURE_THRESHOLD = env.int('VK_API_CIRCUIT_FAILURE_THRESHOLD', default=5)
+VK_API_CIRCUIT_RECOVERY_SECONDS = env.float('VK_API_CIRCUIT_RECOVERY_SECONDS', default=30)
+# Requests per second budget of the access token shared by all processes, 0 to disable limiter
+VK_API_RATE_LIMIT = env.float('VK_API_RATE_LIMIT', default=3)
+VK_API_RATE_LIMIT_BURST = env.float('VK_API_RATE_LIMIT_BURST', default=3)
+VK_API_RATE_LIMIT_BACKGROUND_RESERVE = env.float('VK_API_RATE_LIMIT_BACKGROUND_RESERVE', default=1)
+VK_API_RATE_LIMIT_MAX_WAIT_SECONDS = env.float('VK_API_RATE_LIMIT_MAX_WAIT_SECONDS', default=2)
+VK_API_MAX_RETRIES = env.int('VK_API_MAX_RETRIES', default=3)  # Retries on "Too many requests per second"
+VK_API_RETRY_BACKOFF_SECONDS = env.float('VK_API_RETRY_BACKOFF_SECONDS', default=0.5)
 
 
 LOG_LEVEL = env.str('LOG_LEVEL', default='DEBUG')
@@ -2,6 +2,7 @@
 
 
 . $PROJECT_DIR/shell_scripts/postgres_ready.sh
+. $PROJECT_DIR/shell_scripts/prometheus_multiproc_dir.sh
 
 echo "Celery beat start"
 
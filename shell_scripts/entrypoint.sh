@@ -6,6 +6,7 @@ echo 'Run django entrypoint'
 
 python manage.py migrate
 python manage.py collectstatic --noinput
+. $PROJECT_DIR/shell_scripts/prometheus_multiproc_dir.sh
 uvicorn config.asgi:application --host 0.0.0.0 --workers 4
 
 exec "$@"
\ No newline at end of file
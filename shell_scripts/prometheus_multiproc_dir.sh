@@ -0,0 +1,7 @@
+#!/bin/sh
+
+# Metrics files of previous run must not be aggregated with new processes
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Iterator
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from vk_integration.redis_pool import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+
+HOTNESS_KEY = 'vk_groups:hotness'
+
+
+class AccessTracker:
+    """
+    Count reads of groups in process and add them to scores of groups in Redis sorted set.
+
+    Counts are flushed in one pipeline when enough distinct groups are read or flush interval is over.
+    Scores decay over time, see decay_hotness.
+    """
+
+    def __init__(self, key: str, flush_interval: float, flush_size: int):
+        """
+        Initialization.
+
+        :param key: Redis key of sorted set with scores of groups.
+        :param flush_interval: Max seconds to keep counts in process.
+        :param flush_size: Max number of distinct groups to keep counts in process.
+        """
+        self.key = key
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._counts = Counter()
+        self._last_flush = time.monotonic()
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    def record(self, group_id: int):
+        self._counts[group_id] += 1
+        if len(self._counts) >= self.flush_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            # Counts are taken before the task runs, so reads until then don't start more flushes
+            task = asyncio.get_running_loop().create_task(self._write(self._take_counts()))
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    def _take_counts(self) -> Counter:
+        counts, self._counts = self._counts, Counter()
+        self._last_flush = time.monotonic()
+        return counts
+
+    async def flush(self):
+        await self._write(self._take_counts())
+
+    async def _write(self, counts: Counter):
+        if not counts:
+            return
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for group_id, count in counts.items():
+                    pipe.zincrby(self.key, count, group_id)
+                await pipe.execute()
+        except Exception as exc:
+            logger.error(f'Error on flush of {len(counts)} group access counts, {exc}')
+
+
+access_tracker = AccessTracker(
+    key=HOTNESS_KEY,
+    flush_interval=settings.VK_GROUP_ACCESS_FLUSH_INTERVAL_SECONDS,
+    flush_size=settings.VK_GROUP_ACCESS_FLUSH_SIZE,
+)
+
+
+def record_access(group_id: int):
+    if settings.VK_GROUP_ACCESS_TRACKING_ENABLED:
+        access_tracker.record(group_id)
+
+
+def get_hot_group_ids(min_score: float, limit: int) -> list[int]:
+    """Get ids of groups with score not less than min_score, hottest first."""
+    return [
+        int(group_id) for group_id in
+        get_redis_connection('default').zrevrangebyscore(HOTNESS_KEY, '+inf', min_score, start=0, num=limit)
+    ]
+
+
+def iter_read_group_ids(batch_size: int) -> Iterator[list[int]]:
+    """Yield batches of ids of groups read recently, groups with changed score may be yielded twice."""
+    batch = []
+    for group_id, _ in get_redis_connection('default').zscan_iter(HOTNESS_KEY, count=batch_size):
+        batch.append(int(group_id))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def get_hotness_scores(group_ids: list[int]) -> list[float | None]:
+    """Get scores of groups, None for groups not read recently."""
+    if not group_ids:
+        return []
+    return get_redis_connection('default').zmscore(HOTNESS_KEY, group_ids)
+
+
+def decay_hotness(period: float) -> int:
+    """
+    Decay scores of groups by elapsed period according to half-life of scores.
+
+    Groups with score less than VK_GROUP_HOTNESS_MIN_SCORE are removed.
+
+    :param period: Seconds since previous decay.
+    :return: Number of removed groups.
+    """
+    factor = 0.5 ** (period / settings.VK_GROUP_HOTNESS_HALF_LIFE_SECONDS)
+    redis = get_redis_connection('default')
+    pipe = redis.pipeline()
+    pipe.zunionstore(HOTNESS_KEY, {HOTNESS_KEY: factor})
+    pipe.zremrangebyscore(HOTNESS_KEY, '-inf', f'({settings.VK_GROUP_HOTNESS_MIN_SCORE}')
+    _, removed = pipe.execute()
+    return removed
@@ -0,0 +1,58 @@
+import time
+
+from vk_integration.metrics import vk_api_circuit_opened
+
+
+class CircuitBreaker:
+    """
+    Stop calls to failing service for a while.
+
+    Circuit opens after failure_threshold failures in a row, calls are rejected while it's open.
+    After recovery_timeout one trial call is allowed (half-open state): circuit closes if it succeeds
+    and opens again if it fails. If trial call doesn't finish, next one is allowed after recovery_timeout.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        """
+        Initialization.
+
+        :param failure_threshold: Number of failures in a row to open circuit.
+        :param recovery_timeout: Seconds to reject calls before trial call.
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow_request(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+            self.opened_at = now
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until trial call is allowed."""
+        if self.state == self.CLOSED:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                vk_api_circuit_opened.inc()
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
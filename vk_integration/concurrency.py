@@ -0,0 +1,93 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Share result of in-flight call between concurrent callers with the same key.
+
+    Call runs in a separate task, so cancellation of one caller doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls: dict[tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Task] = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable], *args) -> Any:
+        loop = asyncio.get_running_loop()
+        call_key = (loop, key)
+        task = self._calls.get(call_key)
+        if task is None:
+            task = loop.create_task(func(*args))
+            self._calls[call_key] = task
+
+            def _on_done(done_task: asyncio.Task):
+                self._calls.pop(call_key, None)
+                if not done_task.cancelled():
+                    # Mark exception as retrieved when all callers were cancelled
+                    done_task.exception()
+
+            task.add_done_callback(_on_done)
+        return await asyncio.shield(task)
+
+
+class BatchDispatcher:
+    """
+    Collect keys requested within a short window and load them with one call.
+
+    Batch is sent when the window is over or when it reaches max size, whatever comes first.
+    Each event loop collects its own batches.
+    """
+
+    def __init__(self, load_batch: Callable[[list], Awaitable[dict]], window: float, max_size: int):
+        """
+        Initialization.
+
+        :param load_batch: Coroutine function loading list of keys to dict of results by key.
+        Keys missing in the dict are resolved with None.
+        :param window: Seconds to wait for other keys since first key of the batch.
+        :param max_size: Max number of keys in the batch.
+        """
+        self.load_batch = load_batch
+        self.window = window
+        self.max_size = max_size
+        self._pending: dict[asyncio.AbstractEventLoop, dict[Hashable, asyncio.Future]] = {}
+        self._timers: dict[asyncio.AbstractEventLoop, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable) -> Any:
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(loop)
+        if pending is None:
+            pending = self._pending[loop] = {}
+            self._timers[loop] = loop.call_later(self.window, self._flush, loop)
+        future = pending.get(key)
+        if future is None:
+            future = pending[key] = loop.create_future()
+            if len(pending) >= self.max_size:
+                self._flush(loop)
+        return await asyncio.shield(future)
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+        timer = self._timers.pop(loop, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(loop, None)
+        if pending:
+            task = loop.create_task(self._dispatch(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, pending: dict[Hashable, asyncio.Future]):
+        try:
+            results = await self.load_batch(list(pending))
+        except Exception as exc:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for key, future in pending.items():
+                if not future.done():
+                    future.set_result(results.get(key))
@@ -0,0 +1,162 @@
+"""
+Async-native queries of VkGroup hot paths over psycopg 3 connection pool.
+
+Django async ORM runs queries in a thread, these queries are sent by the event loop itself.
+"""
+import asyncio
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+from vk_integration.models import VkGroup
+from vk_integration.shemas import VkGroupSchema
+
+try:
+    from psycopg.conninfo import make_conninfo
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:
+    make_conninfo = AsyncConnectionPool = None
+
+
+TABLE = VkGroup._meta.db_table
+
+_pools: dict[asyncio.AbstractEventLoop, 'AsyncConnectionPool'] = {}
+
+
+def _get_conninfo() -> str:
+    database = settings.DATABASES['default']
+    return make_conninfo(
+        dbname=database['NAME'],
+        user=database['USER'],
+        password=database['PASSWORD'],
+        host=database['HOST'],
+        port=database['PORT'],
+    )
+
+
+async def get_db_pool() -> 'AsyncConnectionPool':
+    """
+    Get connection pool of the running event loop.
+
+    asyncio connections can't be shared between event loops, so each loop owns its pool.
+    """
+    global _pools
+    if AsyncConnectionPool is None:
+        raise ImproperlyConfigured('psycopg and psycopg_pool are required for async database access')
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        _pools = {pool_loop: loop_pool for pool_loop, loop_pool in _pools.items() if not pool_loop.is_closed()}
+        pool = AsyncConnectionPool(
+            _get_conninfo(),
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            timeout=settings.DB_POOL_TIMEOUT,
+            kwargs=dict(autocommit=True),
+            open=False,
+        )
+        _pools[loop] = pool
+    await pool.open()
+    return pool
+
+
+async def close_db_pool():
+    """Close connection pool of the running event loop."""
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
+
+
+async def _fetch(query: str, params: list) -> list[tuple]:
+    pool = await get_db_pool()
+    async with pool.connection() as connection:
+        cursor = await connection.execute(query, params)
+        return await cursor.fetchall()
+
+
+async def _execute(query: str, params: list) -> int:
+    pool = await get_db_pool()
+    async with pool.connection() as connection:
+        cursor = await connection.execute(query, params)
+        return cursor.rowcount
+
+
+async def fetch_groups(group_ids: list[int], max_age: float | None = None) -> dict[int, VkGroupSchema]:
+    """Get groups, with max_age only groups updated less than max_age seconds ago."""
+    return {group_id: group for group_id, (group, _) in (await fetch_group_entries(group_ids, max_age)).items()}
+
+
+async def fetch_group_entries(group_ids: list[int],
+                              max_age: float | None = None) -> dict[int, tuple[VkGroupSchema, float]]:
+    """Get groups with unix time of their update, with max_age only groups updated less than max_age seconds ago."""
+    query = f'SELECT id, name, users_count, updated_at FROM {TABLE} WHERE id = ANY(%s)'
+    params = [group_ids]
+    if max_age:
+        query += ' AND updated_at >= %s'
+        params.append(timezone.now() - timedelta(seconds=max_age))
+    return {
+        group_id: (VkGroupSchema.trusted(id=group_id, name=name, users_count=users_count), updated_at.timestamp())
+        for group_id, name, users_count, updated_at in await _fetch(query, params)
+    }
+
+
+async def upsert_columns(ids: list[int], names: list[str], users_counts: list[int], content_hashes: list[int]) -> int:
+    """
+    Insert new groups and update existing ones with one query, updated_at of all groups is set to now.
+
+    Groups are given as columns, ids must be unique since row can't be updated twice by INSERT ... ON CONFLICT.
+    """
+    if not ids:
+        return 0
+    now = timezone.now()
+    return await _execute(
+        f'INSERT INTO {TABLE} (id, name, users_count, content_hash, created_at, updated_at) '
+        'SELECT id, name, users_count, content_hash, %s, %s '
+        'FROM unnest(%s::bigint[], %s::varchar[], %s::bigint[], %s::bigint[]) '
+        'AS groups (id, name, users_count, content_hash) '
+        'ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, users_count = EXCLUDED.users_count, '
+        'content_hash = EXCLUDED.content_hash, updated_at = EXCLUDED.updated_at',
+        [now, now, ids, names, users_counts, content_hashes],
+    )
+
+
+async def copy_upsert_columns(ids: list[int], names: list[str], users_counts: list[int],
+                              content_hashes: list[int]) -> int:
+    """
+    Upsert large number of groups, rows are streamed with COPY into temporary table and upserted from it.
+
+    Ids must be unique, updated_at of all groups is set to now.
+    """
+    if not ids:
+        return 0
+    now = timezone.now()
+    pool = await get_db_pool()
+    async with pool.connection() as connection, connection.transaction(), connection.cursor() as cursor:
+        await cursor.execute(
+            'CREATE TEMPORARY TABLE vk_group_import '
+            '(id bigint, name varchar, users_count bigint, content_hash bigint) ON COMMIT DROP'
+        )
+        async with cursor.copy('COPY vk_group_import (id, name, users_count, content_hash) FROM STDIN') as copy:
+            for row in zip(ids, names, users_counts, content_hashes):
+                await copy.write_row(row)
+        await cursor.execute(
+            f'INSERT INTO {TABLE} (id, name, users_count, content_hash, created_at, updated_at) '
+            'SELECT id, name, users_count, content_hash, %s, %s FROM vk_group_import '
+            'ON CONFLICT (id) DO UPDATE SET name = EXCLUDED.name, users_count = EXCLUDED.users_count, '
+            'content_hash = EXCLUDED.content_hash, updated_at = EXCLUDED.updated_at',
+            [now, now],
+        )
+        return cursor.rowcount
+
+
+async def fetch_content_hashes(group_ids: list[int]) -> dict[int, int | None]:
+    return dict(await _fetch(f'SELECT id, content_hash FROM {TABLE} WHERE id = ANY(%s)', [group_ids]))
+
+
+async def touch_groups(group_ids: list[int]) -> int:
+    """Set updated_at of groups to current time."""
+    if not group_ids:
+        return 0
+    return await _execute(f'UPDATE {TABLE} SET updated_at = %s WHERE id = ANY(%s)', [timezone.now(), group_ids])
@@ -0,0 +1,94 @@
+import logging
+import re
+import time
+
+from django.conf import settings
+
+from vk_integration.access_tracking import record_access
+from vk_integration.http_cache import (
+    GroupResponse, body_serializer, get_cache_headers, is_not_modified, make_etag
+)
+from vk_integration.metrics import observe_lookup
+from vk_integration.serializers import decode_group, split_entry
+from vk_integration.services import VkGroupLocalProvider, VkGroupRedisProvider
+
+
+logger = logging.getLogger(__name__)
+
+
+GROUP_PATH_RE = re.compile(r'^/vk/group/(\d+)/$')
+
+JSON_HEADERS = [(b'content-type', b'application/json')]
+
+
+async def get_cached_group_response(group_id: int) -> tuple[bytes, str] | None:
+    """
+    Get response body and ETag of group from local cache or Redis.
+
+    Group cached in Redis as JSON of the body format is returned as is, it is also decoded once to be put
+    in local cache. None is returned if group is not cached or it is older than soft TTL, so it is refreshed
+    by the view.
+    """
+    if settings.VK_GROUP_LOCAL_CACHE_ENABLED:
+        started = time.perf_counter()
+        response = VkGroupLocalProvider.cache.get(group_id)
+        observe_lookup('local', started, hits=int(response is not None), misses=int(response is None))
+        if response:
+            return response.body, response.etag
+
+    started = time.perf_counter()
+    cached_schema = await VkGroupRedisProvider().get_raw(group_id)
+    observe_lookup('redis', started, hits=int(cached_schema is not None), misses=int(cached_schema is None))
+    if not cached_schema:
+        return None
+    version, cached_at, payload = split_entry(cached_schema)
+    if cached_at is None or time.time() - cached_at > settings.VK_GROUP_CACHE_SOFT_TTL_SECONDS:
+        return None
+    if settings.VK_GROUP_LOCAL_CACHE_ENABLED:
+        response = VkGroupLocalProvider().add_in_cache(decode_group(cached_schema))
+        return response.body, response.etag
+    if version == body_serializer.version:
+        return payload, make_etag(payload)
+    response = GroupResponse.from_group(decode_group(cached_schema))
+    return response.body, response.etag
+
+
+def _get_header(scope, name: bytes) -> str | None:
+    for header_name, value in scope['headers']:
+        if header_name == name:
+            return value.decode('latin-1')
+
+
+def with_fast_group_path(application):
+    """
+    Wrap ASGI application to serve cached groups bypassing Django.
+
+    Requests of groups missing in cache are passed to wrapped application.
+    """
+    async def fast_path_application(scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            match = GROUP_PATH_RE.match(scope['path'])
+            if match:
+                group_id = int(match.group(1))
+                try:
+                    cached = await get_cached_group_response(group_id)
+                except Exception as exc:
+                    logger.error(f'Error in group fast path, {exc}')
+                    cached = None
+                if cached is not None:
+                    record_access(group_id)
+                    body, etag = cached
+                    headers = [
+                        (name.lower().encode(), value.encode()) for name, value in get_cache_headers(etag).items()
+                    ]
+                    if is_not_modified(_get_header(scope, b'if-none-match'), etag):
+                        status, body = 304, b''
+                    else:
+                        status = 200
+                        headers += JSON_HEADERS + [(b'content-length', str(len(body)).encode())]
+                    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+                    await send({'type': 'http.response.body', 'body': body})
+                    return
+        return await application(scope, receive, send)
+
+    return fast_path_application
@@ -0,0 +1,53 @@
+"""
+Response bodies of groups and HTTP cache validators.
+
+Group is rendered to response body once, when it is put in local cache. Body is rendered by serializer of
+Redis cache if it writes JSON, so group cached in Redis is sent as is. ETag is hash of body, so it is the same
+in all workers for the same group data and clients revalidate with If-None-Match to get 304 without body.
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils.http import parse_etags
+
+from vk_integration.serializers import JsonGroupSerializer, get_serializer, is_json_payload
+from vk_integration.shemas import VkGroupSchema
+
+
+_cache_serializer = get_serializer(settings.VK_GROUP_CACHE_SERIALIZER)
+body_serializer = _cache_serializer if is_json_payload(_cache_serializer.version) else JsonGroupSerializer()
+
+
+class GroupResponse:
+    """Group with its response body and ETag."""
+
+    __slots__ = ('group', 'body', 'etag')
+
+    def __init__(self, group: VkGroupSchema, body: bytes, etag: str):
+        self.group = group
+        self.body = body
+        self.etag = etag
+
+    @classmethod
+    def from_group(cls, group: VkGroupSchema) -> 'GroupResponse':
+        body = body_serializer.dumps(group)
+        return cls(group, body, make_etag(body))
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def is_not_modified(if_none_match: str | None, etag: str) -> bool:
+    """Check if client has response with etag, by weak comparison as required for If-None-Match."""
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in (tag.removeprefix('W/') for tag in etags)
+
+
+def get_cache_headers(etag: str, stale: bool = False) -> dict[str, str]:
+    """Get ETag and Cache-Control headers, stale group is cached by clients only with revalidation."""
+    max_age = 0 if stale else settings.VK_GROUP_HTTP_MAX_AGE_SECONDS
+    cache_control = f'public, max-age={max_age}' if max_age else 'no-cache'
+    return {'ETag': etag, 'Cache-Control': cache_control}
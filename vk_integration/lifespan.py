@@ -0,0 +1,85 @@
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from celery.canvas import Signature
+from django.conf import settings
+
+from vk_integration.access_tracking import access_tracker
+from vk_integration.db import close_db_pool
+from vk_integration.redis_pool import close_redis, get_redis
+from vk_integration.services import VkGroupLocalProvider, get_vk_api, is_vk_groups_cache_warm
+
+
+logger = logging.getLogger(__name__)
+
+
+_background_tasks: set[asyncio.Task] = set()
+
+WARMUP_LOCK_KEY = 'vk_groups:warmup:lock'
+
+
+async def _start_cache_warmup():
+    """Run cache warm-up task if cache is cold, only one of starting workers sends the task."""
+    if await is_vk_groups_cache_warm():
+        return
+    if not await get_redis().set(WARMUP_LOCK_KEY, 1, nx=True, ex=settings.VK_GROUP_CACHE_WARMUP_LOCK_SECONDS):
+        return
+    task_result = await sync_to_async(
+        Signature('vk_integration.tasks.warm_vk_groups_cache_task').apply_async
+    )()
+    logger.info(f'Run cache warm-up, task={str(task_result)}')
+
+
+async def startup():
+    """Prepare process-wide resources of the running event loop."""
+    if settings.VK_GROUP_LOCAL_CACHE_ENABLED:
+        _background_tasks.add(asyncio.create_task(VkGroupLocalProvider.listen_invalidations()))
+    if settings.VK_GROUP_CACHE_WARMUP_ON_STARTUP:
+        await _start_cache_warmup()
+
+
+async def shutdown():
+    """Release process-wide resources of the running event loop."""
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    await access_tracker.flush()
+    await get_vk_api().close()
+    await close_redis()
+    await close_db_pool()
+
+
+def with_lifespan(application):
+    """
+    Wrap ASGI application to handle lifespan protocol.
+
+    Django ASGI handler doesn't support lifespan events, so they are handled here
+    and all other connections are passed to the wrapped application.
+    """
+    async def lifespan_application(scope, receive, send):
+        if scope['type'] != 'lifespan':
+            return await application(scope, receive, send)
+
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await startup()
+                except Exception as exc:
+                    logger.error(f'Error on application startup, {exc}')
+                    await send({'type': 'lifespan.startup.failed', 'message': str(exc)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                try:
+                    await shutdown()
+                except Exception as exc:
+                    logger.error(f'Error on application shutdown, {exc}')
+                    await send({'type': 'lifespan.shutdown.failed', 'message': str(exc)})
+                    return
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    return lifespan_application
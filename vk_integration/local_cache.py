@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from vk_integration.metrics import local_cache_evictions
+
+
+class LocalCache:
+    """
+    In-process LRU cache with TTL.
+
+    Cache is bounded by number of entries and by estimated size of entries in bytes.
+    It is not thread-safe and intended to be used from one event loop.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int, ttl: float):
+        """
+        Initialization.
+
+        :param max_items: Max number of entries.
+        :param max_bytes: Max total size of entries in bytes.
+        :param ttl: Seconds to keep entry.
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+        self.size_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at < time.monotonic():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, size: int):
+        """
+        Add entry and evict least recently used entries over the limits.
+
+        :param size: Estimated size of entry in bytes.
+        """
+        if size > self.max_bytes:
+            return
+        self.delete(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self.size_bytes += size
+        while len(self._entries) > self.max_items or self.size_bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.size_bytes -= evicted_size
+            local_cache_evictions.inc()
+
+    def delete(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
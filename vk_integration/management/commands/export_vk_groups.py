@@ -0,0 +1,34 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from vk_integration.services import export_vk_groups
+
+
+class Command(BaseCommand):
+    help = 'Export vk groups from database as JSON lines or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='Output file, - for stdout')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows fetched from database at once')
+        parser.add_argument(
+            '--updated-after', type=datetime.fromisoformat, help='Only groups updated since ISO date and time'
+        )
+
+    def handle(self, *args, **options):
+        updated_after = options['updated_after']
+        if updated_after and timezone.is_naive(updated_after):
+            updated_after = timezone.make_aware(updated_after)
+        if options['output'] == '-':
+            output = sys.stdout
+        else:
+            output = open(options['output'], 'w', encoding='utf-8', newline='')
+        try:
+            total = export_vk_groups(output, options['format'], options['batch_size'], updated_after)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(f'Exported {total} vk groups'))
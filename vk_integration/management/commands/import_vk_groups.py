@@ -0,0 +1,57 @@
+import asyncio
+import os
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from vk_integration import lifespan
+from vk_integration.services import import_vk_groups
+
+
+class Command(BaseCommand):
+    help = 'Import vk groups from VK by ids from file or stdin, one id per line'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-', help='File with group ids, - for stdin')
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.VK_GROUP_UPDATE_CONCURRENCY, help='VK requests in flight'
+        )
+        parser.add_argument(
+            '--write-size', type=int, default=5000, help='Groups written to database and Redis at once'
+        )
+        parser.add_argument('--no-cache', action='store_true', help="Don't cache imported groups in Redis")
+        parser.add_argument('--resume', action='store_true', help='Continue from checkpoint of interrupted run')
+
+    def handle(self, *args, **options):
+        def _on_progress(read: int, imported: int, rate: float):
+            self.stdout.write(f'Read {read} ids, imported {imported} groups, {rate:.0f} groups/s')
+
+        async def _import(lines, source: str):
+            try:
+                return await import_vk_groups(
+                    lines,
+                    source,
+                    concurrency=options['concurrency'],
+                    write_size=options['write_size'],
+                    cache=not options['no_cache'],
+                    resume=options['resume'],
+                    on_progress=_on_progress,
+                )
+            finally:
+                await lifespan.shutdown()
+
+        if options['input'] == '-':
+            input_file, source = sys.stdin, 'stdin'
+        else:
+            input_file, source = open(options['input'], encoding='utf-8'), os.path.abspath(options['input'])
+        try:
+            result = asyncio.run(_import(iter(input_file), source))
+        except ValueError as exc:
+            raise CommandError(exc)
+        except Exception as exc:
+            raise CommandError(f'Import is interrupted, {exc}. Run with --resume to continue')
+        finally:
+            if input_file is not sys.stdin:
+                input_file.close()
+        self.stdout.write(self.style.SUCCESS(result))
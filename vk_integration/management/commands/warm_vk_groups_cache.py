@@ -0,0 +1,27 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from vk_integration import lifespan
+from vk_integration.services import warm_vk_groups_cache
+
+
+class Command(BaseCommand):
+    help = 'Load vk groups from database into Redis cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Groups fetched and cached at once')
+        parser.add_argument('--resume', action='store_true', help='Continue from checkpoint of interrupted run')
+
+    def handle(self, *args, **options):
+        def _on_progress(total: int, rate: float):
+            self.stdout.write(f'Cached {total} groups, {rate:.0f} groups/s')
+
+        async def _warm():
+            try:
+                return await warm_vk_groups_cache(options['batch_size'], options['resume'], _on_progress)
+            finally:
+                await lifespan.shutdown()
+
+        result = asyncio.run(_warm())
+        self.stdout.write(self.style.SUCCESS(result))
@@ -0,0 +1,135 @@
+"""
+Prometheus metrics of group lookups, local cache, VK API, its rate limiter and circuit breaker, Redis pool
+and group updates.
+
+Metrics are recorded only if prometheus_client is installed. With PROMETHEUS_MULTIPROC_DIR set,
+metrics of all uvicorn workers or Celery worker processes are written to that directory and aggregated on scrape.
+uvicorn workers serve them at /metrics/, Celery worker serves them on WORKER_METRICS_PORT.
+"""
+import os
+import time
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+
+TIERS = ('local', 'redis', 'negative', 'db', 'api', 'stale')
+
+# From a local cache hit to VK API request with retries
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class _NoopMetric:
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+
+if prometheus_client is not None:
+    tier_latency = prometheus_client.Histogram(
+        'vk_group_tier_latency_seconds', 'Latency of group lookup in cache tier', ['tier'],
+        buckets=LATENCY_BUCKETS,
+    )
+    tier_lookups = prometheus_client.Counter(
+        'vk_group_tier_lookups', 'Groups looked up in cache tier', ['tier', 'result'],
+    )
+    vk_api_errors = prometheus_client.Counter('vk_api_errors', 'Errors returned by VK API', ['code'])
+    vk_api_retries = prometheus_client.Counter('vk_api_retries', 'Retries of requests rejected by VK rate limit')
+    update_duration = prometheus_client.Histogram(
+        'vk_group_update_duration_seconds', 'Duration of update of batch or chunk of groups', ['kind'],
+        buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+    )
+    update_rows = prometheus_client.Counter('vk_group_update_rows', 'Groups processed by update', ['result'])
+    rate_limit_requests = prometheus_client.Counter(
+        'vk_api_rate_limit_requests', 'Requests passed through VK API rate limiter', ['priority', 'result'],
+    )
+    rate_limit_wait = prometheus_client.Histogram(
+        'vk_api_rate_limit_wait_seconds', 'Wait for VK API rate limit budget', ['priority'],
+        buckets=LATENCY_BUCKETS,
+    )
+    rate_limit_queued = prometheus_client.Gauge(
+        'vk_api_rate_limit_queued', 'Requests waiting in VK API rate limiter', multiprocess_mode='livesum',
+    )
+    redis_pool_checkouts = prometheus_client.Counter('redis_pool_checkouts', 'Connections taken from Redis pool')
+    redis_pool_wait = prometheus_client.Histogram(
+        'redis_pool_wait_seconds', 'Wait for free connection of Redis pool', buckets=LATENCY_BUCKETS,
+    )
+    redis_pool_in_use = prometheus_client.Gauge(
+        'redis_pool_connections_in_use', 'Connections taken from Redis pools', multiprocess_mode='livesum',
+    )
+    local_cache_evictions = prometheus_client.Counter(
+        'vk_group_local_cache_evictions', 'Groups evicted from local cache over its size limits',
+    )
+    vk_api_circuit_opened = prometheus_client.Counter('vk_api_circuit_opened', 'Times VK API circuit breaker opened')
+else:
+    tier_latency = tier_lookups = vk_api_errors = vk_api_retries = update_duration = update_rows = _NoopMetric()
+    rate_limit_requests = rate_limit_wait = rate_limit_queued = _NoopMetric()
+    redis_pool_checkouts = redis_pool_wait = redis_pool_in_use = _NoopMetric()
+    local_cache_evictions = vk_api_circuit_opened = _NoopMetric()
+
+# Children are resolved once, labels lookup is not free on hot path
+_tier_latency = {tier: tier_latency.labels(tier) for tier in TIERS}
+_tier_hits = {tier: tier_lookups.labels(tier, 'hit') for tier in TIERS}
+_tier_misses = {tier: tier_lookups.labels(tier, 'miss') for tier in TIERS}
+
+
+def observe_lookup(tier: str, started: float, hits: int, misses: int = 0):
+    """
+    Record lookup of groups in tier.
+
+    :param started: time.perf_counter() before lookup.
+    :param hits: Number of groups found.
+    :param misses: Number of groups not found.
+    """
+    _tier_latency[tier].observe(time.perf_counter() - started)
+    if hits:
+        _tier_hits[tier].inc(hits)
+    if misses:
+        _tier_misses[tier].inc(misses)
+
+
+def observe_update(kind: str, started: float, changed: int, unchanged: int, not_returned: int):
+    update_duration.labels(kind).observe(time.perf_counter() - started)
+    update_rows.labels('changed').inc(changed)
+    update_rows.labels('unchanged').inc(unchanged)
+    update_rows.labels('not_returned').inc(not_returned)
+
+
+def _get_registry() -> 'prometheus_client.CollectorRegistry':
+    """Get registry of metrics of all processes if PROMETHEUS_MULTIPROC_DIR is set, otherwise of this process."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+
+def generate_latest() -> tuple[bytes, str]:
+    """Get metrics of all processes in Prometheus text format and its content type."""
+    return prometheus_client.generate_latest(_get_registry()), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def start_http_server(port: int):
+    """Serve metrics of all processes over HTTP from thread of this process."""
+    prometheus_client.start_http_server(port, registry=_get_registry())
+
+
+def mark_process_dead(pid: int):
+    """Drop live gauges of exited process from aggregated metrics."""
+    if prometheus_client is not None and 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
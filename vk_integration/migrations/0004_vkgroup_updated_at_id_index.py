@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vk_integration', '0003_vkgroup_created_at_vkgroup_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vkgroup',
+            index=models.Index(fields=['updated_at', 'id'], name='vk_group_updated_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vk_integration', '0004_vkgroup_updated_at_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vkgroup',
+            name='content_hash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -7,9 +7,15 @@ class VkGroup(models.Model):
     id = models.BigIntegerField(primary_key=True)
     name = models.CharField(max_length=264)
     users_count = models.BigIntegerField()
+    content_hash = models.BigIntegerField(null=True, blank=True)  # Hash of name and users_count
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='vk_group_updated_at_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.id})"
@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from vk_integration.metrics import rate_limit_queued, rate_limit_requests, rate_limit_wait
+from vk_integration.redis_pool import get_redis
+from vk_integration.vk_api import PRIORITY_BACKGROUND, TooManyRequestsError
+
+
+# Take one token from the bucket if more than reserved tokens are left,
+# otherwise return seconds to wait until it is possible.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens - 1 >= reserve then
+    tokens = tokens - 1
+else
+    wait = (1 + reserve - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter:
+    """
+    Token bucket rate limiter shared by all processes through Redis.
+
+    Background requests leave reserved tokens in the bucket for interactive ones,
+    so bulk refresh can't take the whole budget.
+    """
+
+    def __init__(self, key: str, rate: float, capacity: float, background_reserve: float = 0,
+                 max_wait: float | None = None):
+        """
+        Initialization.
+
+        :param key: Redis key of the bucket.
+        :param rate: Requests per second.
+        :param capacity: Max burst of requests.
+        :param background_reserve: Tokens background requests can't take.
+        :param max_wait: Max seconds interactive request waits for a token, None - no limit.
+        """
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self.background_reserve = background_reserve
+        self.max_wait = max_wait
+
+    async def _take_token(self, reserve: float) -> float:
+        script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+        wait = await script(keys=[self.key], args=[self.rate, self.capacity, reserve])
+        return float(wait)
+
+    async def acquire(self, priority: str):
+        is_background = priority == PRIORITY_BACKGROUND
+        reserve = self.background_reserve if is_background else 0
+        started = time.monotonic()
+        result = 'error'
+        rate_limit_queued.inc()
+        try:
+            wait = await self._take_token(reserve)
+            throttled = wait > 0
+            while wait > 0:
+                waited = time.monotonic() - started
+                if not is_background and self.max_wait is not None and waited + wait > self.max_wait:
+                    result = 'rejected'
+                    raise TooManyRequestsError(f'No VK API rate limit budget for {self.max_wait} seconds')
+                await asyncio.sleep(wait)
+                wait = await self._take_token(reserve)
+            result = 'waited' if throttled else 'immediate'
+        finally:
+            rate_limit_queued.dec()
+            rate_limit_wait.labels(priority).observe(time.monotonic() - started)
+            rate_limit_requests.labels(priority, result).inc()
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from django.conf import settings
+from redis.asyncio import BlockingConnectionPool, Redis
+
+from vk_integration.metrics import redis_pool_checkouts, redis_pool_in_use, redis_pool_wait
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """Blocking connection pool recording checkout metrics, wait is recorded only if all connections are taken."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_use = 0
+
+    async def get_connection(self, *args, **kwargs):
+        redis_pool_checkouts.inc()
+        if self.in_use < self.max_connections:
+            connection = await super().get_connection(*args, **kwargs)
+        else:
+            started = time.perf_counter()
+            try:
+                connection = await super().get_connection(*args, **kwargs)
+            finally:
+                redis_pool_wait.observe(time.perf_counter() - started)
+        self.in_use += 1
+        redis_pool_in_use.inc()
+        return connection
+
+    async def release(self, connection):
+        self.in_use -= 1
+        redis_pool_in_use.dec()
+        await super().release(connection)
+
+
+_clients: dict[asyncio.AbstractEventLoop, Redis] = {}
+
+
+def get_redis() -> Redis:
+    """
+    Get Redis client sharing connection pool of the running event loop.
+
+    asyncio connections can't be shared between event loops, so each loop owns its pool.
+    """
+    global _clients
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        _clients = {client_loop: loop_client for client_loop, loop_client in _clients.items()
+                    if not client_loop.is_closed()}
+        pool = InstrumentedConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=0,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+        )
+        client = Redis(connection_pool=pool)
+        _clients[loop] = client
+    return client
+
+
+async def close_redis():
+    """Close connection pool of the running event loop."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.connection_pool.disconnect()
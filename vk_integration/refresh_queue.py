@@ -0,0 +1,158 @@
+"""
+Schedule of continuous refresh of groups.
+
+Groups are kept in Redis sorted set scored by unix time when group is due to refresh.
+Due groups are claimed with a lease: their score is moved forward by lease time instead of removing them,
+so groups claimed by crashed worker are refreshed again after the lease is over.
+
+Groups are added to schedule when they are first stored, the table is scanned only once, by initial seed.
+Groups which are not refreshed anymore are parked with infinite score and moved back when they are read again.
+"""
+import random
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from vk_integration.access_tracking import HOTNESS_KEY
+from vk_integration.redis_pool import get_redis
+
+
+REFRESH_SCHEDULE_KEY = 'vk_groups:refresh_schedule'
+REFRESH_SCHEDULE_SEEDED_KEY = 'vk_groups:refresh_schedule:seeded'
+REFRESH_SEED_LOCK_KEY = 'vk_groups:refresh_schedule:seed_lock'
+PARKED_SCORE = float('inf')
+
+# KEYS[1] - schedule, ARGV: now, max number of groups, lease deadline
+CLAIM_SCRIPT = """
+local group_ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, group_id in ipairs(group_ids) do
+    redis.call('ZADD', KEYS[1], ARGV[3], group_id)
+end
+return group_ids
+"""
+
+
+def get_refresh_interval(score: float | None) -> int | None:
+    """
+    Get seconds between refreshes of group by its hotness score, None if group is not refreshed.
+
+    Intervals are the same as of hourly sweep, see iter_groups_to_update.
+    """
+    if not settings.VK_GROUP_ACCESS_TRACKING_ENABLED:
+        return settings.VK_GROUP_UPDATE_INTERVAL_SECONDS
+    if score is None:
+        return settings.VK_GROUP_COLD_UPDATE_INTERVAL_SECONDS or None
+    if score >= settings.VK_GROUP_HOT_SCORE:
+        return settings.VK_GROUP_HOT_UPDATE_INTERVAL_SECONDS
+    return settings.VK_GROUP_UPDATE_INTERVAL_SECONDS
+
+
+def get_next_refresh(scores: list[float | None], now: float, spread: bool = False) -> list[float]:
+    """
+    Get unix time of next refresh of groups by their hotness scores, PARKED_SCORE for groups not refreshed.
+
+    :param spread: Spread next refresh randomly over refresh interval, so groups stored at the same time
+        don't come due at once.
+    """
+    due = []
+    for score in scores:
+        interval = get_refresh_interval(score)
+        if interval is None:
+            due.append(PARKED_SCORE)
+        else:
+            due.append(now + (random.uniform(0, interval) if spread else interval))
+    return due
+
+
+def is_refresh_schedule_seeded() -> bool:
+    return bool(get_redis_connection('default').exists(REFRESH_SCHEDULE_SEEDED_KEY))
+
+
+def mark_refresh_schedule_seeded():
+    get_redis_connection('default').set(REFRESH_SCHEDULE_SEEDED_KEY, 1)
+
+
+def acquire_seed_lock(timeout: int) -> bool:
+    """Take lock on initial seed for timeout seconds, so seed is started once while it is running."""
+    return bool(get_redis_connection('default').set(REFRESH_SEED_LOCK_KEY, 1, nx=True, ex=timeout))
+
+
+def add_to_refresh_schedule(due: dict[int, float]) -> int:
+    """
+    Add groups missing in schedule.
+
+    :param due: Unix time of next refresh by group id.
+    :return: Number of added groups.
+    """
+    if not due:
+        return 0
+    return get_redis_connection('default').zadd(REFRESH_SCHEDULE_KEY, due, nx=True)
+
+
+def claim_due_groups(limit: int, lease: float) -> list[int]:
+    """Get up to limit groups due to refresh, most overdue first, and postpone them by lease seconds."""
+    redis = get_redis_connection('default')
+    now = time.time()
+    claim = redis.register_script(CLAIM_SCRIPT)
+    return [int(group_id) for group_id in claim(keys=[REFRESH_SCHEDULE_KEY], args=[now, limit, now + lease])]
+
+
+def promote_read_groups(batch_size: int) -> int:
+    """
+    Move next refresh of read groups closer by their current hotness.
+
+    Groups which became hot don't wait for refresh of not hot group, parked groups which are read again
+    are refreshed again. Only groups in schedule are changed, so ids of missing groups are not added.
+
+    :return: Number of groups with changed next refresh.
+    """
+    redis = get_redis_connection('default')
+    now = time.time()
+    changed = 0
+    batch = {}
+    for group_id, score in redis.zscan_iter(HOTNESS_KEY, count=batch_size):
+        batch[group_id] = score
+        if len(batch) == batch_size:
+            changed += _promote(redis, batch, now)
+            batch = {}
+    if batch:
+        changed += _promote(redis, batch, now)
+    return changed
+
+
+def _promote(redis, scores: dict[bytes, float], now: float) -> int:
+    due = {
+        group_id: next_refresh
+        for group_id, next_refresh in zip(scores, get_next_refresh(list(scores.values()), now))
+        if next_refresh != PARKED_SCORE
+    }
+    if not due:
+        return 0
+    return redis.zadd(REFRESH_SCHEDULE_KEY, due, xx=True, lt=True, ch=True)
+
+
+async def _get_hotness_scores(redis, group_ids: list[int]) -> list[float | None]:
+    if settings.VK_GROUP_ACCESS_TRACKING_ENABLED:
+        return await redis.zmscore(HOTNESS_KEY, group_ids)
+    return [None] * len(group_ids)
+
+
+async def schedule_new_groups(group_ids: list[int]):
+    """Add groups stored for the first time to schedule, groups already in schedule are not changed."""
+    if not group_ids:
+        return
+    redis = get_redis()
+    scores = await _get_hotness_scores(redis, group_ids)
+    due = dict(zip(group_ids, get_next_refresh(scores, time.time())))
+    await redis.zadd(REFRESH_SCHEDULE_KEY, due, nx=True)
+
+
+async def reschedule_refresh(group_ids: list[int]):
+    """Schedule next refresh of refreshed groups, groups which are not refreshed anymore are parked."""
+    if not group_ids:
+        return
+    redis = get_redis()
+    scores = await _get_hotness_scores(redis, group_ids)
+    due = dict(zip(group_ids, get_next_refresh(scores, time.time())))
+    await redis.zadd(REFRESH_SCHEDULE_KEY, due)
@@ -0,0 +1,160 @@
+import json
+import struct
+from abc import ABC, abstractmethod
+
+from django.core.exceptions import ImproperlyConfigured
+
+from vk_integration.shemas import VkGroupSchema
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class BaseGroupSerializer(ABC):
+    """
+    Serializer of group for cache.
+
+    Serialized group starts with version byte of serializer, so groups written
+    by different serializers can be read back.
+    """
+
+    version: int
+
+    @abstractmethod
+    def dumps(self, schema: VkGroupSchema) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def loads(self, payload: bytes) -> VkGroupSchema:
+        raise NotImplementedError
+
+
+class JsonGroupSerializer(BaseGroupSerializer):
+
+    version = 1
+
+    def dumps(self, schema: VkGroupSchema) -> bytes:
+        return json.dumps(dict(schema), ensure_ascii=False).encode()
+
+    def loads(self, payload: bytes) -> VkGroupSchema:
+        return VkGroupSchema.trusted(**json.loads(payload))
+
+
+class OrjsonGroupSerializer(BaseGroupSerializer):
+
+    version = 2
+
+    def dumps(self, schema: VkGroupSchema) -> bytes:
+        return orjson.dumps(dict(schema))
+
+    def loads(self, payload: bytes) -> VkGroupSchema:
+        return VkGroupSchema.trusted(**orjson.loads(payload))
+
+
+class MsgpackGroupSerializer(BaseGroupSerializer):
+
+    version = 3
+
+    def dumps(self, schema: VkGroupSchema) -> bytes:
+        return msgpack.packb((schema.id, schema.name, schema.users_count))
+
+    def loads(self, payload: bytes) -> VkGroupSchema:
+        group_id, name, users_count = msgpack.unpackb(payload)
+        return VkGroupSchema.trusted(id=group_id, name=name, users_count=users_count)
+
+
+class StructGroupSerializer(BaseGroupSerializer):
+    """Fixed layout: id and users_count as 64-bit integers followed by name in utf-8."""
+
+    version = 4
+    layout = struct.Struct('<qq')
+
+    def dumps(self, schema: VkGroupSchema) -> bytes:
+        return self.layout.pack(schema.id, schema.users_count) + schema.name.encode()
+
+    def loads(self, payload: bytes) -> VkGroupSchema:
+        group_id, users_count = self.layout.unpack_from(payload)
+        return VkGroupSchema.trusted(
+            id=group_id, name=payload[self.layout.size:].decode(), users_count=users_count
+        )
+
+
+SERIALIZERS = {
+    'json': JsonGroupSerializer,
+    'orjson': OrjsonGroupSerializer,
+    'msgpack': MsgpackGroupSerializer,
+    'struct': StructGroupSerializer,
+}
+
+_serializers_by_version = {serializer.version: serializer() for serializer in SERIALIZERS.values()}
+
+# Groups cached before serializers were added are plain JSON without version byte
+LEGACY_JSON_PREFIX = b'{'
+
+# Flag in version byte for entry with time of caching after version byte
+FLAG_TIMESTAMPED = 0x80
+timestamp_layout = struct.Struct('<I')
+
+
+def get_serializer(name: str) -> BaseGroupSerializer:
+    if name not in SERIALIZERS:
+        raise ImproperlyConfigured(f'Unknown group serializer {name}, choose one of {", ".join(SERIALIZERS)}')
+    if name == 'orjson' and orjson is None:
+        raise ImproperlyConfigured('orjson is required for orjson group serializer')
+    if name == 'msgpack' and msgpack is None:
+        raise ImproperlyConfigured('msgpack is required for msgpack group serializer')
+    return _serializers_by_version[SERIALIZERS[name].version]
+
+
+def encode_group(schema: VkGroupSchema, serializer: BaseGroupSerializer, cached_at: float | None = None) -> bytes:
+    """
+    Encode group for cache.
+
+    :param cached_at: Unix time of caching to store in entry.
+    """
+    if cached_at is None:
+        return bytes((serializer.version,)) + serializer.dumps(schema)
+    return (
+        bytes((serializer.version | FLAG_TIMESTAMPED,))
+        + timestamp_layout.pack(int(cached_at))
+        + serializer.dumps(schema)
+    )
+
+
+def split_entry(data: bytes) -> tuple[int | None, int | None, bytes]:
+    """
+    Split entry on serializer version, unix time of caching and serialized group.
+
+    Version is None for legacy JSON entries.
+    """
+    if data[:1] == LEGACY_JSON_PREFIX:
+        return None, None, data
+    header = data[0]
+    if header & FLAG_TIMESTAMPED:
+        cached_at, = timestamp_layout.unpack_from(data, 1)
+        return header & ~FLAG_TIMESTAMPED, cached_at, data[1 + timestamp_layout.size:]
+    return header, None, data[1:]
+
+
+def decode_entry(data: bytes) -> tuple[VkGroupSchema, int | None]:
+    """Decode group and unix time of caching, if it is stored in entry."""
+    version, cached_at, payload = split_entry(data)
+    if version is None:
+        return VkGroupSchema.trusted(**json.loads(payload)), cached_at
+    return _serializers_by_version[version].loads(payload), cached_at
+
+
+def is_json_payload(version: int | None) -> bool:
+    """Check if group is serialized to JSON, which can be sent as is."""
+    return version in (None, JsonGroupSerializer.version, OrjsonGroupSerializer.version)
+
+
+def decode_group(data: bytes) -> VkGroupSchema:
+    return decode_entry(data)[0]
@@ -1,23 +1,101 @@
+import asyncio
+import csv
+import functools
 import json
 import logging
+import sys
+import time
 from abc import ABC, abstractmethod
-from datetime import timedelta
+from array import array
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, TextIO
 
 from asgiref.sync import sync_to_async
+from celery import group as celery_group
 from celery.canvas import Signature
 from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
 from django.utils import timezone
 from pydantic import BaseModel
-from redis.asyncio import Redis
+from redis.exceptions import LockError
 
+from config import celery_app
+from vk_integration import db
+from vk_integration.access_tracking import HOTNESS_KEY, get_hot_group_ids, get_hotness_scores, iter_read_group_ids
+from vk_integration.circuit_breaker import CircuitBreaker
+from vk_integration.concurrency import BatchDispatcher, SingleFlight
+from vk_integration.http_cache import GroupResponse
+from vk_integration.local_cache import LocalCache
+from vk_integration.metrics import observe_lookup, observe_update
 from vk_integration.models import VkGroup
-from vk_integration.shemas import VkGroupSchema
-from vk_integration.vk_api import VkAPI
+from vk_integration.rate_limit import RedisRateLimiter
+from vk_integration.redis_pool import get_redis
+from vk_integration.refresh_queue import (
+    acquire_seed_lock, add_to_refresh_schedule, claim_due_groups, get_next_refresh, is_refresh_schedule_seeded,
+    mark_refresh_schedule_seeded, reschedule_refresh, schedule_new_groups,
+)
+from vk_integration.serializers import decode_entry, encode_group, get_serializer
+from vk_integration.shemas import StaleVkGroupSchema, VkGroupBatch, VkGroupSchema
+from vk_integration.vk_api import (
+    ERROR_INVALID_PARAMETER, EXECUTE_MAX_CALLS, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, TooManyRequestsError, VkAPI,
+    VkAPIError, VkAPIUnavailableError
+)
 
 
 logger = logging.getLogger(__name__)
 
 
+vk_api_rate_limiter = RedisRateLimiter(
+    key='vk_api:rate_limit',
+    rate=settings.VK_API_RATE_LIMIT,
+    capacity=settings.VK_API_RATE_LIMIT_BURST,
+    background_reserve=settings.VK_API_RATE_LIMIT_BACKGROUND_RESERVE,
+    max_wait=settings.VK_API_RATE_LIMIT_MAX_WAIT_SECONDS,
+) if settings.VK_API_RATE_LIMIT > 0 else None
+
+
+vk_api_circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.VK_API_CIRCUIT_FAILURE_THRESHOLD,
+    recovery_timeout=settings.VK_API_CIRCUIT_RECOVERY_SECONDS,
+) if settings.VK_API_CIRCUIT_FAILURE_THRESHOLD > 0 else None
+
+
+def get_vk_api() -> VkAPI:
+    """Get VK API client configured from settings."""
+    return VkAPI(
+        settings.VK_ACCESS_TOKEN,
+        base_url=settings.VK_API_BASE_URL,
+        connection_limit=settings.VK_API_CONNECTION_LIMIT,
+        connection_limit_per_host=settings.VK_API_CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout=settings.VK_API_KEEPALIVE_TIMEOUT,
+        timeout=settings.VK_API_TIMEOUT,
+        rate_limiter=vk_api_rate_limiter,
+        max_retries=settings.VK_API_MAX_RETRIES,
+        retry_backoff=settings.VK_API_RETRY_BACKOFF_SECONDS,
+        interactive_timeout=settings.VK_API_INTERACTIVE_TIMEOUT or None,
+        circuit_breaker=vk_api_circuit_breaker,
+    )
+
+
+def db_sync_to_async(func: Callable) -> Callable:
+    """
+    Run ORM function in thread pool of the event loop.
+
+    Pool threads live as long as the process and Django doesn't close their connections at the end of request,
+    so connection of the thread is closed before and after the call if it is broken or older than CONN_MAX_AGE.
+    """
+    @functools.wraps(func)
+    def _wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(_wrapper, thread_sensitive=False)
+
+
 class BaseVkProvider(ABC):
 
     @abstractmethod
@@ -25,131 +103,1196 @@ class BaseVkProvider(ABC):
         raise NotImplementedError
 
 
+async def _get_groups_batch_from_api(group_ids: list[int]) -> dict[int, VkGroupSchema]:
+    """Get existing groups from VK, deleted and banned groups and invalid ids are skipped."""
+    groups, _ = await _get_group_columns_from_api(group_ids, PRIORITY_INTERACTIVE)
+    return {group.id: group for group in groups.schemas()}
+
+
+async def _get_group_columns_from_api(group_ids: list[int], priority: str) -> tuple[VkGroupBatch, int]:
+    """
+    Get existing groups from VK as columnar batch, deleted and banned groups are skipped.
+
+    If VK rejects the batch due to invalid group id, halves of the batch are requested separately.
+
+    :param priority: Priority of requests for rate limiter.
+    :return: Groups and number of ids rejected by VK as invalid.
+    """
+    try:
+        groups = await get_vk_api().get_group_batch_info(
+            group_ids, priority=priority, include_deactivated=False, columnar=True
+        )
+    except VkAPIError as exc:
+        if exc.code != ERROR_INVALID_PARAMETER:
+            raise
+        if len(group_ids) == 1:
+            return VkGroupBatch(), 1
+        middle = len(group_ids) // 2
+        (groups, invalid), (second_groups, second_invalid) = await asyncio.gather(
+            _get_group_columns_from_api(group_ids[:middle], priority),
+            _get_group_columns_from_api(group_ids[middle:], priority),
+        )
+        groups.extend(second_groups)
+        return groups, invalid + second_invalid
+    return groups, 0
+
+
 class VkGroupAPIProvider(BaseVkProvider):
-    """Get group info from VK API."""
+    """
+    Get group info from VK API.
+
+    Lookups of different groups arriving within a short window are sent to VK as one batch request.
+    """
+
+    dispatcher = BatchDispatcher(
+        load_batch=_get_groups_batch_from_api,
+        window=settings.VK_API_BATCH_WINDOW_MS / 1000,
+        max_size=settings.VK_API_BATCH_MAX_SIZE,
+    )
+
     async def get_by_id(self, group_id: int) -> VkGroupSchema | None:
-        api = VkAPI(settings.VK_ACCESS_TOKEN)
-        return await api.get_group_info(group_id)
+        """Get group, None if group doesn't exist or deleted."""
+        if settings.VK_API_BATCH_WINDOW_MS <= 0:
+            groups = await _get_groups_batch_from_api([group_id])
+            return groups.get(group_id)
+        return await self.dispatcher.load(group_id)
+
+    async def get_many(self, group_ids: list[int]) -> dict[int, VkGroupSchema]:
+        """Get groups with batch requests to VK, sent concurrently."""
+        batch_size = settings.VK_MAX_GROUP_UPDATE_SIZE
+        batches = await asyncio.gather(*[
+            _get_groups_batch_from_api(group_ids[i:i + batch_size]) for i in range(0, len(group_ids), batch_size)
+        ])
+        return {group_id: group for batch in batches for group_id, group in batch.items()}
 
 
 class VkGroupRedisProvider(BaseVkProvider):
-    """Get group info from Redis."""
+    """
+    Get group info from Redis.
+
+    Groups are stored in hash `vk_groups` or, with VK_GROUP_CACHE_BUCKET_SIZE, in hashes
+    `vk_groups:<bucket>` of up to bucket size groups each, which Redis keeps in compact listpack encoding.
+    Groups older than hard TTL are skipped on read, on Redis 7.4+ their fields also expire.
+    """
 
     cache_hash_key = 'vk_groups'
+    serializer = get_serializer(settings.VK_GROUP_CACHE_SERIALIZER)
+    bucket_size = settings.VK_GROUP_CACHE_BUCKET_SIZE
+    hard_ttl = settings.VK_GROUP_CACHE_HARD_TTL_SECONDS
+    field_expire_supported: bool | None = None  # Detected on first write
+
+    def _locate(self, group_id: int) -> tuple[str, int]:
+        """Get hash key and field of group."""
+        if not self.bucket_size:
+            return self.cache_hash_key, group_id
+        bucket, field = divmod(group_id, self.bucket_size)
+        return f'{self.cache_hash_key}:{bucket}', field
+
+    def _decode(self, cached_schema: bytes) -> tuple[VkGroupSchema, int | None] | None:
+        """Decode group and time of caching, groups cached longer than hard TTL ago are skipped."""
+        schema, cached_at = decode_entry(cached_schema)
+        if self.hard_ttl and cached_at is not None and time.time() - cached_at > self.hard_ttl:
+            return None
+        return schema, cached_at
+
+    @classmethod
+    async def _is_field_expire_supported(cls) -> bool:
+        """Check if Redis supports hash field expiration, added in Redis 7.4."""
+        if cls.field_expire_supported is None:
+            redis_version = (await get_redis().info('server'))['redis_version']
+            cls.field_expire_supported = tuple(int(part) for part in redis_version.split('.')[:2]) >= (7, 4)
+            if not cls.field_expire_supported:
+                logger.warning(
+                    f'Redis {redis_version} has no hash field expiration, groups older than hard TTL '
+                    'are only skipped on read'
+                )
+        return cls.field_expire_supported
+
+    def _add_in_pipeline(self, pipe, schema: VkGroupSchema, cached_at: float, field_expire: bool):
+        key, field = self._locate(schema.id)
+        pipe.hset(key, field, encode_group(schema, self.serializer, cached_at=cached_at))
+        if field_expire:
+            ttl = max(1, int(self.hard_ttl - (time.time() - cached_at)))
+            pipe.execute_command('HEXPIRE', key, ttl, 'FIELDS', 1, field)
+
+    async def get_raw(self, group_id: int) -> bytes | None:
+        """Get encoded group as it is stored in Redis."""
+        return await get_redis().hget(*self._locate(group_id))
+
+    async def get_entry(self, group_id: int) -> tuple[VkGroupSchema, int | None] | None:
+        """Get group with unix time of caching, None for groups cached before time was stored."""
+        cached_schema = await self.get_raw(group_id)
+        if cached_schema:
+            return self._decode(cached_schema)
 
     async def get_by_id(self, group_id: int) -> VkGroupSchema | None:
-        async with Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0) as conn:
-            cached_schema = await conn.hget(self.cache_hash_key, group_id)
-            if cached_schema:
-                return VkGroupSchema(**json.loads(cached_schema))
+        entry = await self.get_entry(group_id)
+        if entry:
+            return entry[0]
+
+    async def add_in_cache(self, schema: VkGroupSchema, updated_at: float | None = None):
+        await self.add_many_in_cache([schema], None if updated_at is None else [updated_at])
+
+    async def get_many(self, group_ids: list[int]) -> dict[int, VkGroupSchema]:
+        fields_by_key = {}
+        for group_id in group_ids:
+            key, field = self._locate(group_id)
+            fields_by_key.setdefault(key, []).append((group_id, field))
+
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for key, fields in fields_by_key.items():
+                pipe.hmget(key, [field for _, field in fields])
+            results = await pipe.execute()
+
+        groups = {}
+        for fields, cached_schemas in zip(fields_by_key.values(), results):
+            for (group_id, _), cached_schema in zip(fields, cached_schemas):
+                entry = self._decode(cached_schema) if cached_schema else None
+                if entry:
+                    groups[group_id] = entry[0]
+        return groups
+
+    async def add_many_in_cache(self, schemas: list[VkGroupSchema], updated_at: list[float] | None = None):
+        """
+        Cache groups.
 
-    async def add_in_cache(self, schema: VkGroupSchema):
-        async with Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0) as conn:
-            return await conn.hset(self.cache_hash_key, schema.id, json.dumps(dict(schema), ensure_ascii=False))
+        :param updated_at: Unix time of update of each group in database, groups are cached as old as they are.
+            Current time if not given.
+        """
+        if not schemas:
+            return
+        field_expire = bool(self.hard_ttl) and await self._is_field_expire_supported()
+        now = time.time()
+        if updated_at is None:
+            updated_at = [now] * len(schemas)
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for schema, group_updated_at in zip(schemas, updated_at):
+                self._add_in_pipeline(pipe, schema, min(group_updated_at, now), field_expire)
+            await pipe.execute()
+
+
+class VkGroupNegativeCacheProvider:
+    """
+    Remember ids of groups not found in VK for a short time.
+
+    Only groups VK reported as nonexistent or deleted are remembered, errors of VK API are not.
+    """
+
+    key_prefix = 'vk_groups:missing:'
+    ttl = settings.VK_GROUP_NEGATIVE_CACHE_TTL_SECONDS
+
+    async def is_missing(self, group_id: int) -> bool:
+        if not self.ttl:
+            return False
+        return bool(await get_redis().exists(f'{self.key_prefix}{group_id}'))
+
+    async def get_missing(self, group_ids: list[int]) -> set[int]:
+        if not self.ttl or not group_ids:
+            return set()
+        values = await get_redis().mget([f'{self.key_prefix}{group_id}' for group_id in group_ids])
+        return {group_id for group_id, value in zip(group_ids, values) if value is not None}
+
+    async def add(self, group_ids: list[int]):
+        if not self.ttl or not group_ids:
+            return
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for group_id in group_ids:
+                pipe.set(f'{self.key_prefix}{group_id}', 1, ex=self.ttl)
+            await pipe.execute()
+
+
+class VkGroupLocalProvider(BaseVkProvider):
+    """Get group info from in-process cache of worker."""
+
+    invalidation_channel = 'vk_groups:invalidate'
+    entry_overhead_bytes = 640  # Approximate size of schema and response instances without name and body
+    cache = LocalCache(
+        max_items=settings.VK_GROUP_LOCAL_CACHE_MAX_ITEMS,
+        max_bytes=settings.VK_GROUP_LOCAL_CACHE_MAX_BYTES,
+        ttl=settings.VK_GROUP_LOCAL_CACHE_TTL_SECONDS,
+    )
+
+    async def get_by_id(self, group_id: int) -> VkGroupSchema | None:
+        response = self.cache.get(group_id)
+        if response:
+            return response.group
+
+    async def get_response(self, group_id: int) -> GroupResponse | None:
+        return self.cache.get(group_id)
+
+    async def get_many(self, group_ids: list[int]) -> dict[int, VkGroupSchema]:
+        groups = {}
+        for group_id in group_ids:
+            response = self.cache.get(group_id)
+            if response:
+                groups[group_id] = response.group
+        return groups
+
+    def add_in_cache(self, schema: VkGroupSchema) -> GroupResponse:
+        """Cache group with its rendered response body."""
+        response = GroupResponse.from_group(schema)
+        size = self.entry_overhead_bytes + sys.getsizeof(schema.name) + sys.getsizeof(response.body)
+        self.cache.set(schema.id, response, size=size)
+        return response
+
+    @classmethod
+    async def invalidate(cls, group_ids: list[int]):
+        """Drop groups from local caches of all workers."""
+        if group_ids:
+            await get_redis().publish(cls.invalidation_channel, ','.join(str(g_id) for g_id in group_ids))
+
+    @classmethod
+    async def listen_invalidations(cls):
+        """Drop groups from local cache on invalidation messages until cancelled."""
+        while True:
+            try:
+                async with get_redis().pubsub() as pubsub:
+                    await pubsub.subscribe(cls.invalidation_channel)
+                    # Messages might be missed while listener was not subscribed
+                    cls.cache.clear()
+                    async for message in pubsub.listen():
+                        if message['type'] != 'message':
+                            continue
+                        for group_id in message['data'].split(b','):
+                            cls.cache.delete(int(group_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f'Error in local cache invalidation listener, {exc}')
+                await asyncio.sleep(1)
 
 
 class VkGroupDbProvider(BaseVkProvider):
     """Get group info from database."""
 
-    async def get_by_id(self, group_id: int) -> VkGroupSchema | None:
-        group = await VkGroup.objects.filter(pk=group_id).afirst()
+    @staticmethod
+    def _filter(max_age: float | None = None, **lookups):
+        """Filter groups, with max_age only groups updated less than max_age seconds ago."""
+        queryset = VkGroup.objects.filter(**lookups)
+        if max_age:
+            queryset = queryset.filter(updated_at__gte=timezone.now() - timedelta(seconds=max_age))
+        return queryset
+
+    async def get_by_id(self, group_id: int, max_age: float | None = None) -> VkGroupSchema | None:
+        if settings.VK_GROUP_ASYNC_DB_ENABLED:
+            return (await db.fetch_groups([group_id], max_age)).get(group_id)
+        group = await self._filter(max_age, pk=group_id).afirst()
         if group:
-            return VkGroupSchema(id=group.id, name=group.name, users_count=group.users_count)
+            return VkGroupSchema.trusted(id=group.id, name=group.name, users_count=group.users_count)
+
+    async def get_many(self, group_ids: list[int], max_age: float | None = None) -> dict[int, VkGroupSchema]:
+        if settings.VK_GROUP_ASYNC_DB_ENABLED:
+            return await db.fetch_groups(group_ids, max_age)
+        return {
+            group.id: VkGroupSchema.trusted(id=group.id, name=group.name, users_count=group.users_count)
+            async for group in self._filter(max_age, pk__in=group_ids)
+        }
+
+    async def get_entry(self, group_id: int, max_age: float | None = None) -> tuple[VkGroupSchema, float] | None:
+        """Get group with unix time of its update."""
+        return (await self.get_entries([group_id], max_age)).get(group_id)
+
+    async def get_entries(self, group_ids: list[int],
+                          max_age: float | None = None) -> dict[int, tuple[VkGroupSchema, float]]:
+        """Get groups with unix time of their update, to be cached as old as they are."""
+        if settings.VK_GROUP_ASYNC_DB_ENABLED:
+            return await db.fetch_group_entries(group_ids, max_age)
+        return {
+            group.id: (
+                VkGroupSchema.trusted(id=group.id, name=group.name, users_count=group.users_count),
+                group.updated_at.timestamp(),
+            )
+            async for group in self._filter(max_age, pk__in=group_ids)
+        }
 
-    @sync_to_async(thread_sensitive=False)
-    def _create_group(self, schema: VkGroupSchema):
-        created, group = VkGroup.objects.get_or_create(**dict(schema))
-        return group
+    async def bulk_upsert(self, schemas: list[VkGroupSchema]) -> int:
+        """
+        Insert new groups and update existing ones with one INSERT ... ON CONFLICT query.
 
-    async def create(self, schema: VkGroupSchema):
-        return await self._create_group(schema)
+        updated_at of all groups is set to current time.
+        """
+        # Row can't be updated twice by one INSERT ... ON CONFLICT
+        unique_schemas = {schema.id: schema for schema in schemas}.values()
+        return await self.bulk_upsert_batch(VkGroupBatch(
+            array('q', [schema.id for schema in unique_schemas]),
+            [schema.name for schema in unique_schemas],
+            array('q', [schema.users_count for schema in unique_schemas]),
+        ))
 
-    @sync_to_async(thread_sensitive=False)
-    def bulk_update(self, schemas: list[VkGroupSchema]) -> int:
-        return VkGroup.objects.bulk_update(
-            [VkGroup(**dict(schema)) for schema in schemas],
-            ['name', 'users_count']
+    async def bulk_upsert_batch(self, batch: VkGroupBatch, content_hashes: list[int] | None = None) -> int:
+        """
+        Upsert batch of groups with unique ids.
+
+        :param content_hashes: Content hashes of groups if they are already calculated.
+        """
+        if not batch:
+            return 0
+        if content_hashes is None:
+            content_hashes = batch.content_hashes()
+        if settings.VK_GROUP_ASYNC_DB_ENABLED:
+            return await db.upsert_columns(
+                batch.ids.tolist(), batch.names, batch.users_counts.tolist(), content_hashes
+            )
+        return await self._bulk_upsert_batch(batch, content_hashes)
+
+    @db_sync_to_async
+    def _bulk_upsert_batch(self, batch: VkGroupBatch, content_hashes: list[int]) -> int:
+        now = timezone.now()
+        groups = VkGroup.objects.bulk_create(
+            [
+                VkGroup(id=group_id, name=name, users_count=users_count, content_hash=group_hash, updated_at=now)
+                for group_id, name, users_count, group_hash
+                in zip(batch.ids, batch.names, batch.users_counts, content_hashes)
+            ],
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=['name', 'users_count', 'content_hash', 'updated_at'],
         )
+        return len(groups)
+
+    async def get_content_hashes(self, group_ids: list[int]) -> dict[int, int | None]:
+        if settings.VK_GROUP_ASYNC_DB_ENABLED:
+            return await db.fetch_content_hashes(group_ids)
+        return await self._get_content_hashes(group_ids)
+
+    @db_sync_to_async
+    def _get_content_hashes(self, group_ids: list[int]) -> dict[int, int | None]:
+        return dict(VkGroup.objects.filter(pk__in=group_ids).values_list('id', 'content_hash'))
+
+    async def touch(self, group_ids: list[int]) -> int:
+        """Set updated_at of groups to current time."""
+        if not group_ids:
+            return 0
+        if settings.VK_GROUP_ASYNC_DB_ENABLED:
+            return await db.touch_groups(group_ids)
+        return await self._touch(group_ids)
+
+    @db_sync_to_async
+    def _touch(self, group_ids: list[int]) -> int:
+        return VkGroup.objects.filter(pk__in=group_ids).update(updated_at=timezone.now())
 
 
 class VkGroupCompositeProvider(BaseVkProvider):
     """Composite providers to build get group flow."""
 
+    fetch_lock_prefix = 'vk_groups:fetch_lock:'
+    single_flight = SingleFlight()
+    refresh_tasks: set[asyncio.Task] = set()
+
     def __init__(self):
+        self.local_provider = VkGroupLocalProvider() if settings.VK_GROUP_LOCAL_CACHE_ENABLED else None
         self.redis_provider = VkGroupRedisProvider()
         self.db_provider = VkGroupDbProvider()
         self.api_provider = VkGroupAPIProvider()
+        self.negative_provider = VkGroupNegativeCacheProvider()
+
+    async def _get_from_local(self, group_id: int) -> GroupResponse | None:
+        started = time.perf_counter()
+        response = await self.local_provider.get_response(group_id)
+        observe_lookup('local', started, hits=int(response is not None), misses=int(response is None))
+        return response
 
     async def _get_from_redis(self, group_id: int):
-        logger.info(f'Get group from redis {group_id=}')
-        return await self.redis_provider.get_by_id(group_id)
+        """Get group from Redis, refresh it in background if it was cached longer than soft TTL ago."""
+        logger.debug('Get group from redis group_id=%s', group_id)
+        started = time.perf_counter()
+        entry = await self.redis_provider.get_entry(group_id)
+        observe_lookup('redis', started, hits=int(entry is not None), misses=int(entry is None))
+        if entry:
+            group, cached_at = entry
+            if cached_at is None or time.time() - cached_at > settings.VK_GROUP_CACHE_SOFT_TTL_SECONDS:
+                self._refresh_in_background(group_id)
+            return group
+
+    def _refresh_in_background(self, group_id: int):
+        task = asyncio.create_task(self.single_flight.do(('refresh', group_id), self._refresh, group_id))
+        self.refresh_tasks.add(task)
+        task.add_done_callback(self.refresh_tasks.discard)
+
+    async def _refresh(self, group_id: int):
+        """Cache group from database if it was updated there within soft TTL, otherwise from API."""
+        try:
+            entry = await self.db_provider.get_entry(group_id, max_age=settings.VK_GROUP_CACHE_SOFT_TTL_SECONDS)
+            if entry:
+                group, updated_at = entry
+                await self.redis_provider.add_in_cache(group, updated_at)
+            else:
+                group = await self._get_from_api(group_id)
+            if group and self.local_provider:
+                self.local_provider.add_in_cache(group)
+        except Exception as exc:
+            logger.error(f'Error in background refresh of {group_id=}, {exc}')
 
     async def _get_from_db(self, group_id: int):
-        """Get group from database and cache in Redis"""
-        logger.info(f'Get group from database {group_id=}')
-        group = await self.db_provider.get_by_id(group_id)
-        if group:
-            await self.redis_provider.add_in_cache(group)
+        """Get group updated within hard TTL from database and cache in Redis"""
+        logger.debug('Get group from database group_id=%s', group_id)
+        started = time.perf_counter()
+        entry = await self.db_provider.get_entry(group_id, max_age=settings.VK_GROUP_CACHE_HARD_TTL_SECONDS)
+        observe_lookup('db', started, hits=int(entry is not None), misses=int(entry is None))
+        if entry:
+            group, updated_at = entry
+            await self.redis_provider.add_in_cache(group, updated_at)
             return group
 
     async def _get_from_api(self, group_id: int):
-        """Get group from API, save in database and cache in Redis"""
-        logger.info(f'Get group from api {group_id=}')
-        group = await self.api_provider.get_by_id(group_id)
+        """
+        Get group from API, save in database and cache in Redis.
+
+        Fetch is guarded by distributed lock, so only one process requests VK for the group.
+        Process that waited for the lock takes the group from Redis if the lock holder cached it.
+        Group not found in VK is remembered in negative cache.
+        """
+        lock = get_redis().lock(
+            f'{self.fetch_lock_prefix}{group_id}',
+            timeout=settings.VK_GROUP_FETCH_LOCK_TIMEOUT_SECONDS,
+            blocking_timeout=settings.VK_GROUP_FETCH_LOCK_WAIT_SECONDS,
+        )
+        acquired = await lock.acquire(blocking=False)
+        if not acquired:
+            acquired = await lock.acquire()
+            group = await self.redis_provider.get_by_id(group_id)
+            if group or await self.negative_provider.is_missing(group_id):
+                await self._release_lock(lock, acquired)
+                return group
+
+        try:
+            logger.debug('Get group from api group_id=%s', group_id)
+            started = time.perf_counter()
+            group = await self.api_provider.get_by_id(group_id)
+            observe_lookup('api', started, hits=int(group is not None), misses=int(group is None))
+            if group:
+                await self.db_provider.bulk_upsert([group])
+                await self.redis_provider.add_in_cache(group)
+                if settings.VK_GROUP_REFRESH_CONTINUOUS:
+                    await schedule_new_groups([group.id])
+                return group
+            logger.warning('No group from VK for group_id=%s', group_id)
+            await self.negative_provider.add([group_id])
+        finally:
+            await self._release_lock(lock, acquired)
+
+    async def _release_lock(self, lock, acquired: bool):
+        if not acquired:
+            return
+        try:
+            await lock.release()
+        except LockError as exc:
+            logger.warning(f'Fetch lock is lost, {exc}')
+
+    async def _get_from_shared_tiers(self, group_id: int) -> VkGroupSchema | None:
+        group = await self._get_from_redis(group_id)
+        if group:
+            return group
+        started = time.perf_counter()
+        is_missing = await self.negative_provider.is_missing(group_id)
+        observe_lookup('negative', started, hits=int(is_missing), misses=int(not is_missing))
+        if is_missing:
+            return None
+        group = await self._get_from_db(group_id)
         if group:
-            await self.db_provider.create(group)
-            await self.redis_provider.add_in_cache(group)
             return group
-        logger.error(f'No group from VK for {group_id=}')
+        try:
+            return await self._get_from_api(group_id)
+        except (VkAPIUnavailableError, TooManyRequestsError):
+            stale_group = await self._get_stale(group_id)
+            if stale_group:
+                return stale_group
+            raise
+
+    async def _get_stale(self, group_id: int) -> StaleVkGroupSchema | None:
+        """Get last known group data from database regardless of its age, it isn't cached."""
+        started = time.perf_counter()
+        group = await self.db_provider.get_by_id(group_id)
+        observe_lookup('stale', started, hits=int(group is not None), misses=int(group is None))
+        if group:
+            return StaleVkGroupSchema.trusted(**dict(group))
 
     async def get_by_id(self, group_id: int) -> VkGroupSchema | None:
-        """Try to get group from provider, if no group use next provider."""
-        for provider in [self._get_from_redis, self._get_from_db, self._get_from_api]:
-            group = await provider(group_id)
-            if group:
-                return group
+        """
+        Try to get group from provider, if no group use next provider.
+
+        Concurrent lookups of the same group in the worker share one pass through Redis, database and API.
+        If VK API is unavailable, last known group data from database is returned as stale.
+        """
+        response = await self.get_response(group_id)
+        if response:
+            return response.group
+
+    async def get_response(self, group_id: int) -> GroupResponse | None:
+        """Get group with response body, body of group from local cache is rendered once when it's cached."""
+        if self.local_provider:
+            response = await self._get_from_local(group_id)
+            if response:
+                return response
 
+        group = await self.single_flight.do(group_id, self._get_from_shared_tiers, group_id)
+        if not group:
+            return None
+        if self.local_provider and not isinstance(group, StaleVkGroupSchema):
+            return self.local_provider.add_in_cache(group)
+        return GroupResponse.from_group(group)
 
-def update_vk_groups():
+    async def get_many(self, group_ids: list[int]) -> dict[int, VkGroupSchema]:
+        """
+        Get groups by list of ids.
+
+        Each provider is requested once for all groups missed by previous providers,
+        groups from database and API are cached in Redis. Groups older than hard TTL are requested from API.
+        If VK API is unavailable, last known data of groups is returned as stale if all of them are in database.
+        """
+        groups = {}
+        from_local = {}
+        missing = list(dict.fromkeys(group_ids))
+        if self.local_provider:
+            started = time.perf_counter()
+            from_local = await self.local_provider.get_many(missing)
+            observe_lookup('local', started, hits=len(from_local), misses=len(missing) - len(from_local))
+            groups.update(from_local)
+            missing = [group_id for group_id in missing if group_id not in from_local]
+
+        if missing:
+            started = time.perf_counter()
+            from_redis = await self.redis_provider.get_many(missing)
+            observe_lookup('redis', started, hits=len(from_redis), misses=len(missing) - len(from_redis))
+            groups.update(from_redis)
+            missing = [group_id for group_id in missing if group_id not in from_redis]
+
+        if missing:
+            started = time.perf_counter()
+            known_missing = await self.negative_provider.get_missing(missing)
+            observe_lookup('negative', started, hits=len(known_missing), misses=len(missing) - len(known_missing))
+            missing = [group_id for group_id in missing if group_id not in known_missing]
+
+        if missing:
+            started = time.perf_counter()
+            from_db = await self.db_provider.get_entries(missing, max_age=settings.VK_GROUP_CACHE_HARD_TTL_SECONDS)
+            observe_lookup('db', started, hits=len(from_db), misses=len(missing) - len(from_db))
+            await self.redis_provider.add_many_in_cache(
+                [group for group, _ in from_db.values()], [updated_at for _, updated_at in from_db.values()]
+            )
+            groups.update({group_id: group for group_id, (group, _) in from_db.items()})
+            missing = [group_id for group_id in missing if group_id not in from_db]
+
+        if missing:
+            started = time.perf_counter()
+            try:
+                from_api = await self.api_provider.get_many(missing)
+            except (VkAPIUnavailableError, TooManyRequestsError):
+                stale_groups = await self._get_many_stale(missing)
+                if len(stale_groups) < len(missing):
+                    raise
+                groups.update(stale_groups)
+            else:
+                observe_lookup('api', started, hits=len(from_api), misses=len(missing) - len(from_api))
+                if from_api:
+                    await self.db_provider.bulk_upsert(list(from_api.values()))
+                    await self.redis_provider.add_many_in_cache(list(from_api.values()))
+                    if settings.VK_GROUP_REFRESH_CONTINUOUS:
+                        await schedule_new_groups(list(from_api))
+                groups.update(from_api)
+                await self.negative_provider.add([group_id for group_id in missing if group_id not in from_api])
+
+        if self.local_provider:
+            for group_id, group in groups.items():
+                if group_id not in from_local and not isinstance(group, StaleVkGroupSchema):
+                    self.local_provider.add_in_cache(group)
+        return groups
+
+    async def _get_many_stale(self, group_ids: list[int]) -> dict[int, StaleVkGroupSchema]:
+        """Get last known data of groups from database regardless of its age, they aren't cached."""
+        started = time.perf_counter()
+        stale_groups = await self.db_provider.get_many(group_ids)
+        observe_lookup('stale', started, hits=len(stale_groups), misses=len(group_ids) - len(stale_groups))
+        return {group_id: StaleVkGroupSchema.trusted(**dict(group)) for group_id, group in stale_groups.items()}
+
+
+def iter_stale_group_ids(updated_before: datetime, batch_size: int) -> Iterator[list[int]]:
     """
-    Run update process.
+    Yield batches of ids of groups updated before timestamp.
+
+    Groups are paginated by (updated_at, id) key using index, so each page is a cheap index range scan.
+    """
+    queryset = VkGroup.objects.filter(updated_at__lte=updated_before).order_by('updated_at', 'id')
+    page_queryset = queryset
+    while True:
+        page = list(page_queryset.values_list('updated_at', 'id')[:batch_size])
+        if not page:
+            return
+        yield [group_id for _, group_id in page]
+        last_updated_at, last_id = page[-1]
+        # Redundant updated_at__gte is the start key of index scan, OR alone makes each page scan from the start
+        page_queryset = queryset.filter(
+            Q(updated_at__gt=last_updated_at) | Q(updated_at=last_updated_at, id__gt=last_id),
+            updated_at__gte=last_updated_at,
+        )
 
-    Split vk groups on batches and run update task for each batch.
+
+def iter_groups_to_update(now: datetime) -> Iterator[list[int]]:
+    """
+    Yield ids of groups to update, hot groups first.
+
+    Without access tracking all groups are updated every VK_GROUP_UPDATE_INTERVAL_SECONDS.
+    With access tracking groups with score not less than VK_GROUP_HOT_SCORE are updated every
+    VK_GROUP_HOT_UPDATE_INTERVAL_SECONDS, other read groups every VK_GROUP_UPDATE_INTERVAL_SECONDS
+    and groups not read recently every VK_GROUP_COLD_UPDATE_INTERVAL_SECONDS or never.
+    """
+    batch_size = settings.VK_MAX_GROUP_UPDATE_SIZE
+    updated_before = now - timedelta(seconds=settings.VK_GROUP_UPDATE_INTERVAL_SECONDS)
+    if not settings.VK_GROUP_ACCESS_TRACKING_ENABLED:
+        yield from iter_stale_group_ids(updated_before, batch_size)
+        return
+
+    hot_ids = get_hot_group_ids(settings.VK_GROUP_HOT_SCORE, settings.VK_GROUP_HOT_MAX_GROUPS)
+    hot_updated_before = now - timedelta(seconds=settings.VK_GROUP_HOT_UPDATE_INTERVAL_SECONDS)
+    for i in range(0, len(hot_ids), batch_size):
+        yield list(VkGroup.objects.filter(
+            pk__in=hot_ids[i:i + batch_size], updated_at__lte=hot_updated_before
+        ).values_list('id', flat=True))
+
+    # Read groups are taken from hotness set, so the run doesn't scan groups which are not read
+    hot_ids = set(hot_ids)
+    for group_ids in iter_read_group_ids(batch_size):
+        yield list(VkGroup.objects.filter(
+            pk__in=[group_id for group_id in group_ids if group_id not in hot_ids], updated_at__lte=updated_before
+        ).values_list('id', flat=True))
+
+    if settings.VK_GROUP_COLD_UPDATE_INTERVAL_SECONDS:
+        cold_updated_before = now - timedelta(seconds=settings.VK_GROUP_COLD_UPDATE_INTERVAL_SECONDS)
+        for group_ids in iter_stale_group_ids(cold_updated_before, batch_size):
+            scores = get_hotness_scores(group_ids)
+            yield [group_id for group_id, score in zip(group_ids, scores) if score is None]
+
+
+def _get_update_task() -> tuple[str, int]:
+    """Get name of update task and number of groups per task."""
+    if settings.VK_GROUP_UPDATE_CHUNK_SIZE:
+        return 'vk_integration.tasks.update_vk_groups_chunk_task', settings.VK_GROUP_UPDATE_CHUNK_SIZE
+    return 'vk_integration.tasks.update_vk_groups_batch_task', settings.VK_MAX_GROUP_UPDATE_SIZE
+
+
+def _run_update_tasks(batches: list[list[int]]):
+    task_name, _ = _get_update_task()
+    group_result = celery_group(
+        Signature(task_name, args=(group_ids,)) for group_ids in batches
+    ).apply_async()
+    logger.info(f'Run update of {len(batches)} batches, group={str(group_result)}')
+
+
+def update_vk_groups(on_progress: Callable[[int], None] | None = None):
     """
-    def _run_update_task(group_ids: list[int]):
-        task_result = Signature(
-            'vk_integration.tasks.update_vk_groups_batch_task',
-            args=(group_ids,)
-        ).apply_async()
-        logger.info(f'Run update batch of {group_ids} groups, task={str(task_result)}')
+    Run update process.
 
-    groups_to_update = []
+    Split vk groups to update on batches and run update task for each batch.
+    Tasks are sent as groups of VK_GROUP_UPDATE_DISPATCH_BATCHES batches while groups are streamed.
+    Number of groups updated per run is limited by VK_GROUP_UPDATE_BUDGET.
+    If VK_GROUP_UPDATE_CHUNK_SIZE is set, each task gets chunk of several VK batches fetched concurrently.
+
+    :param on_progress: Callback called with number of groups sent to update so far.
+    """
+    _, batch_size = _get_update_task()
+    batches = []
+    batch = []
     total_group_update = 0
-    last_update_timestamp = timezone.now() - timedelta(seconds=settings.VK_GROUP_UPDATE_INTERVAL_SECONDS)
-    for group in VkGroup.objects.filter(updated_at__lte=last_update_timestamp):
-        groups_to_update.append(group.id)
-        total_group_update += 1
-        if len(groups_to_update) == settings.VK_MAX_GROUP_UPDATE_SIZE:
-            _run_update_task(groups_to_update)
-            groups_to_update = []
+    budget = settings.VK_GROUP_UPDATE_BUDGET or None
+    for group_ids in iter_groups_to_update(timezone.now()):
+        if budget is not None:
+            group_ids = group_ids[:budget - total_group_update]
+        batch.extend(group_ids)
+        total_group_update += len(group_ids)
+        while len(batch) >= batch_size:
+            batches.append(batch[:batch_size])
+            batch = batch[batch_size:]
+        if len(batches) >= settings.VK_GROUP_UPDATE_DISPATCH_BATCHES:
+            _run_update_tasks(batches)
+            batches = []
+            logger.info(f'Sent {total_group_update - len(batch)} vk groups to update')
+            if on_progress:
+                on_progress(total_group_update - len(batch))
+        if budget is not None and total_group_update >= budget:
+            break
 
-    if len(groups_to_update) > 0:
-        _run_update_task(groups_to_update)
+    if batch:
+        batches.append(batch)
+    if len(batches) > 0:
+        _run_update_tasks(batches)
 
     result_msg = f"Run update for {total_group_update} vk groups"
     logger.info(result_msg)
     return result_msg
 
 
+async def _store_updated_groups(batch: VkGroupBatch) -> tuple[int, int]:
+    """
+    Write groups fetched from VK.
+
+    Only groups changed since last update are written to database and cached in Redis,
+    unchanged groups just get new updated_at.
+
+    :return: Numbers of changed and unchanged groups.
+    """
+    db_provider = VkGroupDbProvider()
+    redis_provider = VkGroupRedisProvider()
+    stored_hashes = await db_provider.get_content_hashes(batch.ids.tolist())
+    content_hashes = batch.content_hashes()
+    changed_indexes = []
+    unchanged_ids = []
+    seen_ids = set()
+    for index, (group_id, group_hash) in enumerate(zip(batch.ids, content_hashes)):
+        if group_id in seen_ids:
+            continue
+        seen_ids.add(group_id)
+        if stored_hashes.get(group_id) == group_hash:
+            unchanged_ids.append(group_id)
+        else:
+            changed_indexes.append(index)
+
+    changed = batch.take(changed_indexes)
+    updated = await db_provider.bulk_upsert_batch(changed, [content_hashes[index] for index in changed_indexes])
+    await db_provider.touch(unchanged_ids)
+    await redis_provider.add_many_in_cache(list(changed.schemas()))
+    await VkGroupLocalProvider.invalidate(changed.ids.tolist())
+    return updated, len(unchanged_ids)
+
+
 async def update_vk_groups_batch(group_ids: list[int]) -> str:
-    """Update groups data."""
-    api = VkAPI(settings.VK_ACCESS_TOKEN)
+    """Update groups data with one VK request."""
+    started = time.perf_counter()
+    groups_info = await get_vk_api().get_group_batch_info(group_ids, priority=PRIORITY_BACKGROUND, columnar=True)
+    updated, unchanged = await _store_updated_groups(groups_info)
+    if settings.VK_GROUP_REFRESH_CONTINUOUS:
+        await reschedule_refresh(group_ids)
+    observe_update('batch', started, updated, unchanged, len(group_ids) - len(groups_info))
+    result_msg = (
+        f"Updated batch of {len(groups_info)} vk groups: {updated} changed, {unchanged} unchanged, "
+        f"{len(group_ids) - len(groups_info)} not returned by VK"
+    )
+    logger.info(result_msg)
+    return result_msg
+
+
+async def update_vk_groups_chunk(group_ids: list[int], concurrency: int, use_execute: bool = False) -> str:
+    """
+    Update groups data with several concurrent VK requests.
+
+    Chunk is split into batches of VK_MAX_GROUP_UPDATE_SIZE groups, up to `concurrency` requests are sent at once.
+    Fetched batches are written by single writer while next batches are fetched.
+
+    :param group_ids: List of VK group ID.
+    :param concurrency: Max number of VK requests in flight.
+    :param use_execute: Pack up to EXECUTE_MAX_CALLS batches into one VK execute request.
+    """
+    started = time.perf_counter()
+    api = get_vk_api()
+    batches = [
+        group_ids[i:i + settings.VK_MAX_GROUP_UPDATE_SIZE]
+        for i in range(0, len(group_ids), settings.VK_MAX_GROUP_UPDATE_SIZE)
+    ]
+    calls_per_request = EXECUTE_MAX_CALLS if use_execute else 1
+    requests = [batches[i:i + calls_per_request] for i in range(0, len(batches), calls_per_request)]
+    semaphore = asyncio.Semaphore(concurrency)
+    fetched: asyncio.Queue[VkGroupBatch | None] = asyncio.Queue()
+    fetched_ids = []
+
+    async def _fetch(request_batches: list[list[int]]):
+        async with semaphore:
+            if use_execute:
+                groups_batches = await api.get_group_batches_info(
+                    request_batches, priority=PRIORITY_BACKGROUND, columnar=True
+                )
+            else:
+                groups_batches = [
+                    await api.get_group_batch_info(request_batches[0], priority=PRIORITY_BACKGROUND, columnar=True)
+                ]
+        for groups_info in groups_batches:
+            await fetched.put(groups_info)
+        for batch_ids in request_batches:
+            fetched_ids.extend(batch_ids)
+
+    async def _write() -> tuple[int, int, int]:
+        updated = unchanged = returned = 0
+        while (groups_info := await fetched.get()) is not None:
+            batch_updated, batch_unchanged = await _store_updated_groups(groups_info)
+            updated += batch_updated
+            unchanged += batch_unchanged
+            returned += len(groups_info)
+        return updated, unchanged, returned
+
+    writer = asyncio.create_task(_write())
+    try:
+        results = await asyncio.gather(*(_fetch(request_batches) for request_batches in requests),
+                                       return_exceptions=True)
+    finally:
+        await fetched.put(None)
+    updated, unchanged, returned = await writer
+    # Groups of failed requests are refreshed again when their lease in schedule is over
+    if settings.VK_GROUP_REFRESH_CONTINUOUS:
+        await reschedule_refresh(fetched_ids)
+    observe_update('chunk', started, updated, unchanged, len(group_ids) - returned)
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    for exc in errors:
+        logger.error(f'Error on fetch of vk groups batch, {exc}')
+    result_msg = (
+        f"Updated chunk of {returned} vk groups in {len(requests)} requests: {updated} changed, "
+        f"{unchanged} unchanged, {len(group_ids) - returned} not returned by VK, {len(errors)} failed requests"
+    )
+    logger.info(result_msg)
+    return result_msg
+
+
+def seed_refresh_schedule() -> int:
+    """
+    Add all stored groups missing in refresh schedule.
+
+    Runs once, when schedule is empty, later groups are added when they are stored for the first time.
+    Next refresh of added group is spread randomly over its refresh interval, so refreshes of
+    groups updated at the same time don't come due at once.
+
+    :return: Number of added groups.
+    """
+    total_added = 0
+    now = time.time()
+    for group_ids in iter_stale_group_ids(timezone.now(), settings.VK_GROUP_REFRESH_SEED_BATCH_SIZE):
+        if settings.VK_GROUP_ACCESS_TRACKING_ENABLED:
+            scores = get_hotness_scores(group_ids)
+        else:
+            scores = [None] * len(group_ids)
+        total_added += add_to_refresh_schedule(dict(zip(group_ids, get_next_refresh(scores, now, spread=True))))
+    mark_refresh_schedule_seeded()
+    logger.info(f'Added {total_added} vk groups to refresh schedule')
+    return total_added
+
+
+def get_celery_queue_length() -> int:
+    with celery_app.connection_for_read() as connection:
+        return connection.default_channel.client.llen(celery_app.conf.task_default_queue)
+
+
+# Initial seed is started again if it has not finished in this time
+REFRESH_SEED_LOCK_SECONDS = 60 * 60
+
+
+def drain_refresh_schedule() -> str:
+    """
+    Send update tasks for groups due to refresh.
+
+    Called every VK_GROUP_REFRESH_DRAIN_INTERVAL_SECONDS, so refreshes are spread evenly over time.
+    Number of groups per drain is limited by VK requests per second given to refresh,
+    drain is skipped while Celery queue is longer than VK_GROUP_REFRESH_MAX_QUEUE_LENGTH.
+    """
+    if not is_refresh_schedule_seeded() and acquire_seed_lock(REFRESH_SEED_LOCK_SECONDS):
+        Signature('vk_integration.tasks.seed_vk_groups_refresh_schedule_task').apply_async()
+        logger.info('Started initial seed of vk groups refresh schedule')
+
+    queue_length = get_celery_queue_length()
+    if queue_length > settings.VK_GROUP_REFRESH_MAX_QUEUE_LENGTH:
+        result_msg = f"Skipped refresh of vk groups, {queue_length} tasks in Celery queue"
+        logger.warning(result_msg)
+        return result_msg
+
+    limit = int(
+        settings.VK_GROUP_REFRESH_VK_REQUESTS_PER_SECOND
+        * settings.VK_GROUP_REFRESH_DRAIN_INTERVAL_SECONDS
+        * settings.VK_MAX_GROUP_UPDATE_SIZE
+    )
+    group_ids = claim_due_groups(limit, lease=settings.VK_GROUP_REFRESH_LEASE_SECONDS)
+    _, batch_size = _get_update_task()
+    batches = [group_ids[i:i + batch_size] for i in range(0, len(group_ids), batch_size)]
+    if batches:
+        _run_update_tasks(batches)
+
+    result_msg = f"Run refresh for {len(group_ids)} due vk groups"
+    logger.info(result_msg)
+    return result_msg
+
+
+WARMUP_CHECKPOINT_KEY = 'vk_groups:warmup:checkpoint'
+WARMUP_DONE_KEY = 'vk_groups:warmup:done'
+
+
+async def warm_vk_groups_cache(batch_size: int, resume: bool = False,
+                               on_progress: Callable[[int, float], None] | None = None) -> str:
+    """
+    Load groups from database into Redis, most read groups first, then most recently updated groups.
+
+    Groups are streamed with server-side cursor and cached with one pipeline per batch.
+    Position of last cached batch is saved as checkpoint to resume interrupted warm-up.
+
+    :param batch_size: Number of groups fetched and cached at once.
+    :param resume: Continue from checkpoint of previous warm-up.
+    :param on_progress: Callback called with number of cached groups and groups per second after each batch.
+    """
+    redis = get_redis()
+    redis_provider = VkGroupRedisProvider()
+    queryset = VkGroup.objects.order_by('-updated_at', '-id')
+    if settings.VK_GROUP_CACHE_HARD_TTL_SECONDS:
+        queryset = queryset.filter(
+            updated_at__gte=timezone.now() - timedelta(seconds=settings.VK_GROUP_CACHE_HARD_TTL_SECONDS)
+        )
+    if resume:
+        checkpoint = await redis.get(WARMUP_CHECKPOINT_KEY)
+        if checkpoint:
+            last_updated_at, last_id = checkpoint.decode().split('|')
+            last_updated_at = datetime.fromisoformat(last_updated_at)
+            queryset = queryset.filter(
+                Q(updated_at__lt=last_updated_at) | Q(updated_at=last_updated_at, id__lt=int(last_id))
+            )
+
+    total_cached = 0
+    started = time.monotonic()
+    batch = []
+
+    if settings.VK_GROUP_ACCESS_TRACKING_ENABLED and not resume:
+        hot_ids = [int(group_id) for group_id in await redis.zrevrangebyscore(
+            HOTNESS_KEY, '+inf', settings.VK_GROUP_HOTNESS_MIN_SCORE, start=0, num=settings.VK_GROUP_HOT_MAX_GROUPS
+        )]
+        db_provider = VkGroupDbProvider()
+        for i in range(0, len(hot_ids), batch_size):
+            hot_groups = await db_provider.get_entries(
+                hot_ids[i:i + batch_size], max_age=settings.VK_GROUP_CACHE_HARD_TTL_SECONDS
+            )
+            await redis_provider.add_many_in_cache(
+                [group for group, _ in hot_groups.values()], [updated_at for _, updated_at in hot_groups.values()]
+            )
+            total_cached += len(hot_groups)
+        logger.info(f'Cached {total_cached} most read vk groups')
+
+    async def _cache_batch():
+        nonlocal total_cached
+        await redis_provider.add_many_in_cache(
+            [
+                VkGroupSchema.trusted(id=group_id, name=name, users_count=users_count)
+                for group_id, name, users_count, _ in batch
+            ],
+            [updated_at.timestamp() for _, _, _, updated_at in batch],
+        )
+        _, _, _, last_updated_at = batch[-1]
+        await redis.set(WARMUP_CHECKPOINT_KEY, f'{last_updated_at.isoformat()}|{batch[-1][0]}')
+        total_cached += len(batch)
+        rate = total_cached / (time.monotonic() - started)
+        logger.info(f'Cached {total_cached} vk groups, {rate:.0f} groups/s')
+        if on_progress:
+            on_progress(total_cached, rate)
+
+    rows = queryset.values_list('id', 'name', 'users_count', 'updated_at').aiterator(chunk_size=batch_size)
+    async for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            await _cache_batch()
+            batch = []
+    if batch:
+        await _cache_batch()
+
+    await redis.delete(WARMUP_CHECKPOINT_KEY)
+    await redis.set(WARMUP_DONE_KEY, 1)
+    result_msg = f"Cached {total_cached} vk groups in {time.monotonic() - started:.1f}s"
+    logger.info(result_msg)
+    return result_msg
+
+
+async def is_vk_groups_cache_warm() -> bool:
+    """Check if cache was warmed up after last restart or flush of Redis."""
+    return bool(await get_redis().exists(WARMUP_DONE_KEY))
+
+
+IMPORT_CHECKPOINT_KEY = 'vk_groups:import:checkpoint'
+
+
+def _read_ids(lines: Iterator[str], batch_size: int) -> tuple[list[int], int, int]:
+    """
+    Read up to batch_size group ids, one per line, blank lines are skipped.
+
+    :return: Ids, number of read lines and number of lines which are not ids.
+    """
+    group_ids = []
+    read = invalid = 0
+    for line in lines:
+        read += 1
+        line = line.strip()
+        if line:
+            try:
+                group_ids.append(int(line))
+            except ValueError:
+                invalid += 1
+        if len(group_ids) == batch_size:
+            break
+    return group_ids, read, invalid
+
+
+def _skip_lines(lines: Iterator[str], count: int):
+    for _ in range(count):
+        if next(lines, None) is None:
+            break
+
+
+async def import_vk_groups(lines: Iterator[str], source: str, concurrency: int, write_size: int,
+                           cache: bool = True, resume: bool = False,
+                           on_progress: Callable[[int, int, float], None] | None = None) -> str:
+    """
+    Import groups by ids from VK into database and Redis, deleted and banned groups are not imported.
+
+    Ids are read lazily and fetched by batches of VK_MAX_GROUP_UPDATE_SIZE with up to `concurrency` requests
+    in flight. Fetched groups are written by single writer every `write_size` groups: streamed into database
+    with COPY if VK_GROUP_ASYNC_DB_ENABLED and cached in Redis with one pipeline. Queues between reader, fetchers
+    and writer are bounded, so memory doesn't grow with number of ids. Number of input lines before first
+    batch which is not written yet is saved as checkpoint to resume interrupted import.
+
+    :param lines: Lines of input with one group id per line.
+    :param source: Name of input, checkpoint is resumed only for the same input.
+    :param concurrency: Max number of VK requests in flight.
+    :param write_size: Number of groups written to database and Redis at once.
+    :param cache: Cache imported groups in Redis.
+    :param resume: Continue from checkpoint of previous import.
+    :param on_progress: Callback called with number of read ids, imported groups and groups per second
+        after each write.
+    """
+    redis = get_redis()
     db_provider = VkGroupDbProvider()
-    groups_to_update = []
-    groups_info = await api.get_group_batch_info(group_ids)
-    groups_to_update.extend(groups_info)
+    redis_provider = VkGroupRedisProvider()
+
+    skipped_lines = 0
+    if resume:
+        checkpoint = await redis.get(IMPORT_CHECKPOINT_KEY)
+        if checkpoint:
+            checkpoint_source, checkpoint_lines = checkpoint.decode().rsplit('|', 1)
+            if checkpoint_source != source:
+                raise ValueError(f'Checkpoint is saved for import of {checkpoint_source}, not {source}')
+            skipped_lines = int(checkpoint_lines)
+            await asyncio.to_thread(_skip_lines, lines, skipped_lines)
+
+    to_fetch: asyncio.Queue[tuple[int, int, list[int]] | None] = asyncio.Queue(maxsize=concurrency)
+    fetched: asyncio.Queue[tuple[int, int, VkGroupBatch] | None] = asyncio.Queue(maxsize=concurrency)
+    stats = dict(read=0, invalid=0, rejected=0, returned=0, imported=0)
+    started = time.monotonic()
+
+    async def _read():
+        seq = 0
+        line_num = skipped_lines
+        while True:
+            # Reading of file or stdin may block, so it's done in thread
+            group_ids, read, invalid = await asyncio.to_thread(
+                _read_ids, lines, settings.VK_MAX_GROUP_UPDATE_SIZE
+            )
+            if not read:
+                break
+            line_num += read
+            stats['read'] += len(group_ids)
+            stats['invalid'] += invalid
+            await to_fetch.put((seq, line_num, group_ids))
+            seq += 1
+        for _ in range(concurrency):
+            await to_fetch.put(None)
+
+    async def _fetch():
+        while (item := await to_fetch.get()) is not None:
+            seq, line_num, group_ids = item
+            groups_info = VkGroupBatch()
+            if group_ids:
+                # Invalid id in customer list must not fail the batch, otherwise resumed import fails on it again
+                groups_info, rejected = await _get_group_columns_from_api(group_ids, PRIORITY_BACKGROUND)
+                stats['rejected'] += rejected
+            await fetched.put((seq, line_num, groups_info))
+        await fetched.put(None)
 
-    updated = await db_provider.bulk_update(groups_to_update)
-    result_msg = f"Updated batch of {updated} vk groups"
+    async def _store(batch: VkGroupBatch):
+        batch = batch.unique()
+        if settings.VK_GROUP_ASYNC_DB_ENABLED:
+            stats['imported'] += await db.copy_upsert_columns(
+                batch.ids.tolist(), batch.names, batch.users_counts.tolist(), batch.content_hashes()
+            )
+        else:
+            stats['imported'] += await db_provider.bulk_upsert_batch(batch)
+        if cache:
+            await redis_provider.add_many_in_cache(list(batch.schemas()))
+        await VkGroupLocalProvider.invalidate(batch.ids.tolist())
+        if settings.VK_GROUP_REFRESH_CONTINUOUS:
+            await reschedule_refresh(batch.ids.tolist())
+
+    async def _write():
+        finished_fetchers = 0
+        buffer = VkGroupBatch()
+        # Batches may be fetched out of order, checkpoint moves only over batches written without gaps
+        written_line_nums = {}
+        next_seq = 0
+        pending_line_nums = {}
+        while finished_fetchers < concurrency:
+            item = await fetched.get()
+            if item is not None:
+                seq, line_num, groups_info = item
+                buffer.extend(groups_info)
+                pending_line_nums[seq] = line_num
+                stats['returned'] += len(groups_info)
+                if len(buffer) < write_size:
+                    continue
+            else:
+                finished_fetchers += 1
+                if finished_fetchers < concurrency or not pending_line_nums:
+                    continue
+
+            await _store(buffer)
+            buffer = VkGroupBatch()
+            written_line_nums.update(pending_line_nums)
+            pending_line_nums = {}
+            checkpoint_line = None
+            while next_seq in written_line_nums:
+                checkpoint_line = written_line_nums.pop(next_seq)
+                next_seq += 1
+            if checkpoint_line is not None:
+                await redis.set(IMPORT_CHECKPOINT_KEY, f'{source}|{checkpoint_line}')
+
+            rate = stats['imported'] / (time.monotonic() - started)
+            logger.info(f'Read {stats["read"]} ids, imported {stats["imported"]} vk groups, {rate:.0f} groups/s')
+            if on_progress:
+                on_progress(stats['read'], stats['imported'], rate)
+
+    tasks = [asyncio.create_task(_read()), asyncio.create_task(_write())]
+    tasks += [asyncio.create_task(_fetch()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    await redis.delete(IMPORT_CHECKPOINT_KEY)
+    elapsed = time.monotonic() - started
+    result_msg = (
+        f"Imported {stats['imported']} vk groups of {stats['read']} ids in {elapsed:.1f}s "
+        f"({stats['imported'] / elapsed:.0f} groups/s): "
+        f"{stats['read'] - stats['returned'] - stats['rejected']} deactivated or not returned by VK, "
+        f"{stats['rejected']} ids rejected by VK, {stats['invalid']} invalid lines"
+    )
     logger.info(result_msg)
     return result_msg
+
+
+EXPORT_FIELDS = ('id', 'name', 'users_count', 'updated_at')
+
+
+def export_vk_groups(output: TextIO, output_format: str, batch_size: int,
+                     updated_after: datetime | None = None) -> int:
+    """
+    Write groups ordered by id to output as JSON lines or CSV with header.
+
+    Groups are streamed from database with server-side cursor by batch_size rows.
+
+    :param output_format: jsonl or csv.
+    :return: Number of written groups.
+    """
+    queryset = VkGroup.objects.order_by('id')
+    if updated_after:
+        queryset = queryset.filter(updated_at__gte=updated_after)
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=batch_size)
+    if output_format == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(EXPORT_FIELDS)
+    total = 0
+    for group_id, name, users_count, updated_at in rows:
+        if output_format == 'csv':
+            writer.writerow((group_id, name, users_count, updated_at.isoformat()))
+        else:
+            output.write(json.dumps(
+                dict(id=group_id, name=name, users_count=users_count, updated_at=updated_at.isoformat()),
+                ensure_ascii=False,
+            ) + '\n')
+        total += 1
+    return total
@@ -1,6 +1,20 @@
+import hashlib
+from array import array
+from typing import Iterator
+
 from pydantic import BaseModel
 
 
+# model_construct in pydantic 2, construct in pydantic 1
+_CONSTRUCT = 'model_construct' if hasattr(BaseModel, 'model_construct') else 'construct'
+
+
+def content_hash(name: str, users_count: int) -> int:
+    """Signed 64-bit hash of group data to detect changes."""
+    digest = hashlib.blake2b(f'{name}\x00{users_count}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
 class VkGroupSchema(BaseModel):
 
     id: int
@@ -15,3 +29,76 @@ class VkGroupSchema(BaseModel):
             name=response_data.get('name'),
             users_count=response_data.get('members_count')
         )
+
+    @classmethod
+    def trusted(cls, id: int, name: str, users_count: int) -> 'VkGroupSchema':
+        """Build schema without validation from data written by the service itself, e.g. cache or database."""
+        return getattr(cls, _CONSTRUCT)(id=id, name=name, users_count=users_count)
+
+    def content_hash(self) -> int:
+        """Signed 64-bit hash of group data to detect changes."""
+        return content_hash(self.name, self.users_count)
+
+
+class StaleVkGroupSchema(VkGroupSchema):
+    """Last known group data served while VK API is unavailable."""
+
+
+class VkGroupBatch:
+    """
+    Columnar batch of groups for refresh.
+
+    Ids and users counts are kept in arrays of 64-bit integers, so batch from VK response
+    doesn't create schema or model instance per group.
+    """
+
+    __slots__ = ('ids', 'names', 'users_counts')
+
+    def __init__(self, ids: array | None = None, names: list[str] | None = None, users_counts: array | None = None):
+        self.ids = ids if ids is not None else array('q')
+        self.names = names if names is not None else []
+        self.users_counts = users_counts if users_counts is not None else array('q')
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_response(cls, groups_data: list[dict], include_deactivated: bool = True) -> 'VkGroupBatch':
+        """Build batch from vk api response of groups.getById."""
+        batch = cls()
+        for group_data in groups_data:
+            if not include_deactivated and group_data.get('deactivated'):
+                continue
+            batch.ids.append(group_data['id'])
+            batch.names.append(group_data['name'])
+            batch.users_counts.append(group_data.get('members_count') or 0)
+        return batch
+
+    def content_hashes(self) -> list[int]:
+        return [content_hash(name, users_count) for name, users_count in zip(self.names, self.users_counts)]
+
+    def extend(self, batch: 'VkGroupBatch'):
+        self.ids.extend(batch.ids)
+        self.names.extend(batch.names)
+        self.users_counts.extend(batch.users_counts)
+
+    def unique(self) -> 'VkGroupBatch':
+        """Get batch with first occurrence of each group."""
+        first_indexes = {}
+        for index, group_id in enumerate(self.ids):
+            first_indexes.setdefault(group_id, index)
+        if len(first_indexes) == len(self.ids):
+            return self
+        return self.take(list(first_indexes.values()))
+
+    def take(self, indexes: list[int]) -> 'VkGroupBatch':
+        """Get batch of groups at indexes."""
+        return VkGroupBatch(
+            array('q', [self.ids[i] for i in indexes]),
+            [self.names[i] for i in indexes],
+            array('q', [self.users_counts[i] for i in indexes]),
+        )
+
+    def schemas(self) -> Iterator[VkGroupSchema]:
+        for group_id, name, users_count in zip(self.ids, self.names, self.users_counts):
+            yield VkGroupSchema.trusted(id=group_id, name=name, users_count=users_count)
@@ -1,18 +1,114 @@
+import asyncio
 from logging import getLogger
 
-from asgiref.sync import async_to_sync
-from celery import shared_task
+from asgiref.sync import sync_to_async
+from celery import shared_task, signals
+from django.conf import settings
+from django.db import close_old_connections
 
-from vk_integration.services import update_vk_groups, update_vk_groups_batch
+from vk_integration import lifespan, metrics
+from vk_integration.access_tracking import decay_hotness
+from vk_integration.refresh_queue import promote_read_groups
+from vk_integration.services import (
+    drain_refresh_schedule, seed_refresh_schedule, update_vk_groups, update_vk_groups_batch, update_vk_groups_chunk,
+    warm_vk_groups_cache
+)
 
 logger = getLogger(__name__)
 
 
-@shared_task
-def update_vk_groups_task():
-    return update_vk_groups()
+_worker_loop: asyncio.AbstractEventLoop | None = None
+
+
+async def _with_db_connections_checked(coro):
+    """Close broken or expired connection of the thread running async ORM queries before and after the task."""
+    await sync_to_async(close_old_connections)()
+    try:
+        return await coro
+    finally:
+        await sync_to_async(close_old_connections)()
+
+
+def run_in_worker_loop(coro):
+    """
+    Run coroutine in the event loop of worker process.
+
+    Loop lives as long as worker process, so connection pools bound to it are reused between tasks.
+    """
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+    return _worker_loop.run_until_complete(_with_db_connections_checked(coro))
+
+
+@signals.worker_process_shutdown.connect
+@signals.worker_shutdown.connect
+def on_worker_shutdown(**kwargs):
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        return
+    try:
+        _worker_loop.run_until_complete(lifespan.shutdown())
+    except Exception as exc:
+        logger.error(f'Error on worker shutdown, {exc}')
+    finally:
+        _worker_loop.close()
+        _worker_loop = None
+
+
+@signals.worker_init.connect
+def on_worker_init(**kwargs):
+    """Serve metrics of worker from its main process, pool processes write them to PROMETHEUS_MULTIPROC_DIR."""
+    if settings.WORKER_METRICS_PORT and metrics.prometheus_client is not None:
+        metrics.start_http_server(settings.WORKER_METRICS_PORT)
+
+
+@signals.worker_process_shutdown.connect
+def on_worker_process_shutdown(pid: int, **kwargs):
+    metrics.mark_process_dead(pid)
+
+
+@shared_task(bind=True)
+def update_vk_groups_task(self):
+    def _on_progress(total: int):
+        self.update_state(state='PROGRESS', meta={'sent': total})
+
+    return update_vk_groups(on_progress=_on_progress)
 
 
 @shared_task
 def update_vk_groups_batch_task(group_ids: list[int]):
-    return async_to_sync(update_vk_groups_batch)(group_ids)
+    return run_in_worker_loop(update_vk_groups_batch(group_ids))
+
+
+@shared_task
+def update_vk_groups_chunk_task(group_ids: list[int]):
+    return run_in_worker_loop(update_vk_groups_chunk(
+        group_ids,
+        concurrency=settings.VK_GROUP_UPDATE_CONCURRENCY,
+        use_execute=settings.VK_GROUP_UPDATE_USE_EXECUTE,
+    ))
+
+
+@shared_task
+def drain_vk_groups_refresh_schedule_task():
+    return drain_refresh_schedule()
+
+
+@shared_task
+def seed_vk_groups_refresh_schedule_task():
+    return f"Added {seed_refresh_schedule()} vk groups to refresh schedule"
+
+
+@shared_task
+def warm_vk_groups_cache_task(resume: bool = True):
+    return run_in_worker_loop(warm_vk_groups_cache(settings.VK_GROUP_CACHE_WARMUP_BATCH_SIZE, resume=resume))
+
+
+@shared_task
+def decay_vk_groups_hotness_task():
+    removed = decay_hotness(settings.VK_GROUP_HOTNESS_DECAY_INTERVAL_SECONDS)
+    promoted = 0
+    if settings.VK_GROUP_REFRESH_CONTINUOUS:
+        promoted = promote_read_groups(settings.VK_GROUP_REFRESH_SEED_BATCH_SIZE)
+    return f"Decayed hotness of vk groups, removed {removed} cold groups, promoted refresh of {promoted} read groups"
@@ -1,3 +1,514 @@
-from django.test import TestCase
+import asyncio
+import json
+from collections import Counter
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from vk_integration import serializers, services
+from vk_integration.access_tracking import AccessTracker
+from vk_integration.circuit_breaker import CircuitBreaker
+from vk_integration.concurrency import BatchDispatcher, SingleFlight
+from vk_integration.local_cache import LocalCache
+from vk_integration.refresh_queue import PARKED_SCORE
+from vk_integration.serializers import SERIALIZERS, decode_entry, encode_group, get_serializer
+from vk_integration.shemas import VkGroupBatch, VkGroupSchema, content_hash
+from vk_integration.vk_api import ERROR_INVALID_PARAMETER, VkAPI, VkAPIError
+
+
+class BatchDispatcherTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.batches = []
+
+    async def load_batch(self, keys: list) -> dict:
+        self.batches.append(keys)
+        return {key: key * 10 for key in keys if key != 0}
+
+    async def test_flush_at_max_size(self):
+        dispatcher = BatchDispatcher(self.load_batch, window=60, max_size=3)
+
+        results = await asyncio.wait_for(asyncio.gather(*(dispatcher.load(key) for key in (1, 2, 3))), timeout=1)
+
+        self.assertEqual(results, [10, 20, 30])
+        self.assertEqual(self.batches, [[1, 2, 3]])
+
+    async def test_flush_at_end_of_window(self):
+        dispatcher = BatchDispatcher(self.load_batch, window=0.01, max_size=100)
+
+        results = await asyncio.gather(dispatcher.load(1), dispatcher.load(2), dispatcher.load(0))
+
+        self.assertEqual(results, [10, 20, None])
+        self.assertEqual(self.batches, [[1, 2, 0]])
+
+    async def test_same_key_is_loaded_once(self):
+        dispatcher = BatchDispatcher(self.load_batch, window=0.01, max_size=100)
+
+        results = await asyncio.gather(dispatcher.load(1), dispatcher.load(1))
+
+        self.assertEqual(results, [10, 10])
+        self.assertEqual(self.batches, [[1]])
+
+    async def test_exception_is_set_for_all_waiters(self):
+        async def load_batch(keys: list) -> dict:
+            raise ValueError('VK is down')
+
+        dispatcher = BatchDispatcher(load_batch, window=0.01, max_size=100)
+
+        results = await asyncio.gather(dispatcher.load(1), dispatcher.load(2), return_exceptions=True)
+
+        self.assertEqual(len(results), 2)
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+
+
+class SingleFlightTestCase(SimpleTestCase):
+
+    async def test_concurrent_callers_share_call(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key * 10
+
+        results = await asyncio.gather(*(single_flight.do(1, fetch, 1) for _ in range(5)))
+
+        self.assertEqual(results, [10] * 5)
+        self.assertEqual(calls, [1])
+        self.assertEqual(len(single_flight), 0)
+
+    async def test_exception_is_raised_for_all_callers(self):
+        single_flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError('VK is down')
+
+        results = await asyncio.gather(*(single_flight.do(1, fetch) for _ in range(3)), return_exceptions=True)
+
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+        self.assertEqual(len(single_flight), 0)
+
+    async def test_cancelled_caller_does_not_cancel_call(self):
+        single_flight = SingleFlight()
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def fetch():
+            started.set()
+            await release.wait()
+            return 'group'
+
+        cancelled = asyncio.create_task(single_flight.do(1, fetch))
+        waiting = asyncio.create_task(single_flight.do(1, fetch))
+        await started.wait()
+
+        cancelled.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await cancelled
+        release.set()
+
+        self.assertEqual(await asyncio.wait_for(waiting, timeout=1), 'group')
+
+
+class GroupSerializerTestCase(SimpleTestCase):
+
+    group = VkGroupSchema(id=1, name='Группа «ВКонтакте»', users_count=123456789)
+
+    def get_available_serializers(self):
+        available = []
+        for name in SERIALIZERS:
+            if (name, None) in (('orjson', serializers.orjson), ('msgpack', serializers.msgpack)):
+                continue
+            available.append(get_serializer(name))
+        return available
+
+    def test_round_trip(self):
+        for serializer in self.get_available_serializers():
+            with self.subTest(serializer=type(serializer).__name__):
+                group, cached_at = decode_entry(encode_group(self.group, serializer))
+
+                self.assertEqual(group, self.group)
+                self.assertIsNone(cached_at)
+
+    def test_round_trip_with_cached_at(self):
+        for serializer in self.get_available_serializers():
+            with self.subTest(serializer=type(serializer).__name__):
+                group, cached_at = decode_entry(encode_group(self.group, serializer, cached_at=1700000000.7))
+
+                self.assertEqual(group, self.group)
+                self.assertEqual(cached_at, 1700000000)
+
+    def test_decode_legacy_json_entry(self):
+        data = json.dumps(dict(self.group), ensure_ascii=False).encode()
+
+        group, cached_at = decode_entry(data)
+
+        self.assertEqual(group, self.group)
+        self.assertIsNone(cached_at)
+
+    def test_unknown_serializer(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_serializer('pickle')
+
+
+class FakeResponse:
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def json(self, content_type=None):
+        return self.data
+
+
+class FakeSession:
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    def get(self, url, **options):
+        return FakeResponse(self.data)
+
+
+class VkAPITestCase(SimpleTestCase):
+
+    def get_api(self, response_data: dict) -> VkAPI:
+        # Instance is created bypassing SingletonAPI, so each test has its own client
+        api = VkAPI.__new__(VkAPI)
+        api.__init__('token')
+        api._get_session = lambda: FakeSession(response_data)
+        return api
+
+    async def test_empty_response_is_not_error(self):
+        api = self.get_api({'response': []})
+
+        self.assertIsNone(await api.get_group_info(1))
+        self.assertEqual(await api.get_group_batch_info([1, 2]), [])
+        self.assertEqual(len(await api.get_group_batch_info([1, 2], columnar=True)), 0)
+
+    async def test_error_response(self):
+        api = self.get_api({'error': {'error_code': ERROR_INVALID_PARAMETER, 'error_msg': 'Invalid group id'}})
+
+        with self.assertRaises(VkAPIError) as context:
+            await api.get_group_batch_info([-1])
+
+        self.assertEqual(context.exception.code, ERROR_INVALID_PARAMETER)
+
+
+class FakeRedisPipeline:
+
+    def __init__(self, redis: 'FakeRedis'):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def zincrby(self, key: str, amount: float, member: int):
+        self.commands.append((key, amount, member))
+
+    async def execute(self):
+        self.redis.executed += 1
+        for key, amount, member in self.commands:
+            self.redis.scores[member] += amount
+
+
+class FakeRedis:
+    """Async Redis client with sorted set increments in pipeline only."""
+
+    def __init__(self):
+        self.scores = Counter()
+        self.executed = 0
+
+    def pipeline(self, transaction: bool = True) -> FakeRedisPipeline:
+        return FakeRedisPipeline(self)
+
+
+class AccessTrackerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = mock.patch('vk_integration.access_tracking.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_flush_adds_counts_in_one_pipeline(self):
+        tracker = AccessTracker('hotness', flush_interval=60, flush_size=100)
+        for group_id in (1, 2, 1):
+            tracker.record(group_id)
+
+        await tracker.flush()
+
+        self.assertEqual(self.redis.scores, Counter({1: 2, 2: 1}))
+        self.assertEqual(self.redis.executed, 1)
+
+    async def test_flush_at_flush_size(self):
+        tracker = AccessTracker('hotness', flush_interval=60, flush_size=2)
+        for group_id in (1, 1, 2):
+            tracker.record(group_id)
+        await asyncio.gather(*tracker._flush_tasks)
+
+        self.assertEqual(self.redis.scores, Counter({1: 2, 2: 1}))
+        self.assertEqual(self.redis.executed, 1)
+
+    async def test_burst_after_flush_interval_starts_one_flush(self):
+        tracker = AccessTracker('hotness', flush_interval=60, flush_size=100)
+        tracker._last_flush -= 61
+        for group_id in range(20):
+            tracker.record(group_id)
+
+        self.assertEqual(len(tracker._flush_tasks), 1)
+        await asyncio.gather(*tracker._flush_tasks)
+        self.assertEqual(self.redis.scores, Counter([0]))
+
+        await tracker.flush()
+        self.assertEqual(self.redis.scores, Counter(range(20)))
+
+
+class LocalCacheTestCase(SimpleTestCase):
+
+    def test_get(self):
+        cache = LocalCache(max_items=10, max_bytes=1000, ttl=60)
+        cache.set(1, 'group', size=10)
+
+        self.assertEqual(cache.get(1), 'group')
+        self.assertIsNone(cache.get(2))
+
+    @mock.patch('vk_integration.local_cache.time.monotonic')
+    def test_expired_entry_is_deleted(self, monotonic):
+        monotonic.return_value = 100
+        cache = LocalCache(max_items=10, max_bytes=1000, ttl=60)
+        cache.set(1, 'group', size=10)
+
+        monotonic.return_value = 161
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size_bytes, 0)
+
+    def test_least_recently_used_entry_is_evicted_over_max_items(self):
+        cache = LocalCache(max_items=2, max_bytes=1000, ttl=60)
+        cache.set(1, 'first', size=10)
+        cache.set(2, 'second', size=10)
+        cache.get(1)
+        cache.set(3, 'third', size=10)
+
+        self.assertEqual(cache.get(1), 'first')
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(3), 'third')
+
+    def test_entries_are_evicted_over_max_bytes(self):
+        cache = LocalCache(max_items=10, max_bytes=100, ttl=60)
+        cache.set(1, 'first', size=40)
+        cache.set(2, 'second', size=40)
+        cache.set(3, 'third', size=40)
+
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size_bytes, 80)
+
+    def test_entry_larger_than_max_bytes_is_not_cached(self):
+        cache = LocalCache(max_items=10, max_bytes=100, ttl=60)
+        cache.set(1, 'first', size=40)
+        cache.set(2, 'huge', size=101)
+
+        self.assertEqual(cache.get(1), 'first')
+        self.assertIsNone(cache.get(2))
+
+    def test_replaced_entry_size_is_not_counted_twice(self):
+        cache = LocalCache(max_items=10, max_bytes=100, ttl=60)
+        cache.set(1, 'first', size=40)
+        cache.set(1, 'updated', size=50)
+
+        self.assertEqual(cache.get(1), 'updated')
+        self.assertEqual(cache.size_bytes, 50)
+
+
+@mock.patch('vk_integration.circuit_breaker.time.monotonic', return_value=100)
+class CircuitBreakerTestCase(SimpleTestCase):
+
+    def test_opens_after_failures_in_a_row(self, monotonic):
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.retry_after(), 30)
+
+    def test_closes_after_successful_trial_request(self, monotonic):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+        breaker.record_failure()
+
+        monotonic.return_value = 130
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_opens_again_after_failed_trial_request(self, monotonic):
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+        for _ in range(3):
+            breaker.record_failure()
+
+        monotonic.return_value = 130
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+    def test_next_trial_request_after_unfinished_one(self, monotonic):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+        breaker.record_failure()
+        monotonic.return_value = 130
+        self.assertTrue(breaker.allow_request())
+
+        monotonic.return_value = 160
+        self.assertTrue(breaker.allow_request())
+
+
+class VkGroupBatchTestCase(SimpleTestCase):
+
+    response = [
+        {'id': 1, 'name': 'First', 'members_count': 10},
+        {'id': 2, 'name': 'Deleted', 'deactivated': 'deleted'},
+        {'id': 3, 'name': 'Third', 'members_count': 30},
+    ]
+
+    def test_from_response(self):
+        batch = VkGroupBatch.from_response(self.response)
+
+        self.assertEqual(list(batch.ids), [1, 2, 3])
+        self.assertEqual(batch.names, ['First', 'Deleted', 'Third'])
+        self.assertEqual(list(batch.users_counts), [10, 0, 30])
+
+    def test_from_response_without_deactivated(self):
+        batch = VkGroupBatch.from_response(self.response, include_deactivated=False)
+
+        self.assertEqual(list(batch.ids), [1, 3])
+
+    def test_schemas_are_equal_to_validated(self):
+        batch = VkGroupBatch.from_response(self.response, include_deactivated=False)
+
+        self.assertEqual(
+            list(batch.schemas()),
+            [VkGroupSchema.from_response(group_data) for group_data in (self.response[0], self.response[2])],
+        )
+
+    def test_content_hashes(self):
+        batch = VkGroupBatch.from_response(self.response[:1])
+
+        self.assertEqual(batch.content_hashes(), [content_hash('First', 10)])
+        self.assertNotEqual(batch.content_hashes(), [content_hash('First', 11)])
+
+    def test_unique_keeps_first_occurrence(self):
+        batch = VkGroupBatch.from_response(self.response)
+        batch.extend(VkGroupBatch.from_response([{'id': 1, 'name': 'Renamed', 'members_count': 11}]))
+
+        unique = batch.unique()
+
+        self.assertEqual(list(unique.ids), [1, 2, 3])
+        self.assertEqual(unique.names, ['First', 'Deleted', 'Third'])
+
+    def test_trusted_schema_is_equal_to_validated(self):
+        self.assertEqual(
+            VkGroupSchema.trusted(id=1, name='First', users_count=10),
+            VkGroupSchema(id=1, name='First', users_count=10),
+        )
+
+
+@override_settings(
+    VK_GROUP_ACCESS_TRACKING_ENABLED=True,
+    VK_GROUP_HOT_SCORE=10,
+    VK_GROUP_HOT_UPDATE_INTERVAL_SECONDS=3600,
+    VK_GROUP_UPDATE_INTERVAL_SECONDS=86400,
+    VK_GROUP_COLD_UPDATE_INTERVAL_SECONDS=0,
+    VK_GROUP_REFRESH_SEED_BATCH_SIZE=2,
+)
+class SeedRefreshScheduleTestCase(SimpleTestCase):
+
+    @mock.patch.object(services, 'mark_refresh_schedule_seeded')
+    @mock.patch.object(services, 'add_to_refresh_schedule', side_effect=len)
+    @mock.patch.object(services, 'get_hotness_scores', side_effect=[[20, None], [5]])
+    @mock.patch.object(services, 'iter_stale_group_ids', return_value=[[1, 2], [3]])
+    @mock.patch.object(services.time, 'time', return_value=1000)
+    def test_seed(self, time, iter_stale_group_ids, get_hotness_scores, add_to_refresh_schedule,
+                  mark_refresh_schedule_seeded):
+        self.assertEqual(services.seed_refresh_schedule(), 3)
+
+        first_due, second_due = (call.args[0] for call in add_to_refresh_schedule.call_args_list)
+        # Next refresh is spread over refresh interval, group not read recently is parked
+        self.assertTrue(1000 <= first_due[1] <= 1000 + 3600)
+        self.assertEqual(first_due[2], PARKED_SCORE)
+        self.assertTrue(1000 <= second_due[3] <= 1000 + 86400)
+        mark_refresh_schedule_seeded.assert_called_once_with()
+
+
+@override_settings(
+    VK_GROUP_REFRESH_MAX_QUEUE_LENGTH=100,
+    VK_GROUP_REFRESH_VK_REQUESTS_PER_SECOND=0.5,
+    VK_GROUP_REFRESH_DRAIN_INTERVAL_SECONDS=60,
+    VK_GROUP_REFRESH_LEASE_SECONDS=900,
+    VK_MAX_GROUP_UPDATE_SIZE=500,
+    VK_GROUP_UPDATE_CHUNK_SIZE=0,
+)
+@mock.patch.object(services, 'is_refresh_schedule_seeded', return_value=True)
+@mock.patch.object(services, '_run_update_tasks')
+class DrainRefreshScheduleTestCase(SimpleTestCase):
+
+    @mock.patch.object(services, 'claim_due_groups', return_value=list(range(1200)))
+    @mock.patch.object(services, 'get_celery_queue_length', return_value=100)
+    def test_due_groups_are_limited_by_vk_requests_per_second(self, get_celery_queue_length, claim_due_groups,
+                                                             run_update_tasks, is_refresh_schedule_seeded):
+        services.drain_refresh_schedule()
+
+        # 0.5 requests per second for 60 seconds, 500 groups per request
+        claim_due_groups.assert_called_once_with(15000, lease=900)
+        batches = run_update_tasks.call_args.args[0]
+        self.assertEqual([len(batch) for batch in batches], [500, 500, 200])
+
+    @mock.patch.object(services, 'claim_due_groups')
+    @mock.patch.object(services, 'get_celery_queue_length', return_value=101)
+    def test_skipped_while_celery_queue_is_long(self, get_celery_queue_length, claim_due_groups,
+                                                run_update_tasks, is_refresh_schedule_seeded):
+        services.drain_refresh_schedule()
+
+        claim_due_groups.assert_not_called()
+        run_update_tasks.assert_not_called()
+
+    @mock.patch.object(services, 'claim_due_groups', return_value=[])
+    @mock.patch.object(services, 'get_celery_queue_length', return_value=0)
+    @mock.patch.object(services, 'acquire_seed_lock', side_effect=[True, False])
+    @mock.patch.object(services, 'Signature')
+    def test_initial_seed_is_started_once(self, signature, acquire_seed_lock, get_celery_queue_length,
+                                          claim_due_groups, run_update_tasks, is_refresh_schedule_seeded):
+        is_refresh_schedule_seeded.return_value = False
+
+        services.drain_refresh_schedule()
+        services.drain_refresh_schedule()
+
+        signature.assert_called_once_with('vk_integration.tasks.seed_vk_groups_refresh_schedule_task')
+        signature.return_value.apply_async.assert_called_once_with()
+        run_update_tasks.assert_not_called()
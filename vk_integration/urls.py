@@ -6,5 +6,6 @@ from vk_integration import views
 app_name = 'vk'
 
 urlpatterns = [
-    path('group/<int:group_id>/', views.GroupView.as_view(), name='group_info')
+    path('group/<int:group_id>/', views.GroupView.as_view(), name='group_info'),
+    path('groups/', views.GroupsView.as_view(), name='groups_info'),
 ]
\ No newline at end of file
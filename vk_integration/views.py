@@ -1,25 +1,113 @@
+import json
 from logging import getLogger
 
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 
+from vk_integration import metrics
+from vk_integration.access_tracking import record_access
+from vk_integration.http_cache import get_cache_headers, is_not_modified
 from vk_integration.services import VkGroupCompositeProvider
+from vk_integration.shemas import StaleVkGroupSchema
+from vk_integration.vk_api import TooManyRequestsError, VkAPIUnavailableError
 
 
 logger = getLogger(__name__)
 
 
+STALE_HEADERS = {'Warning': '110 - "Response is Stale"', 'X-Cache-Stale': '1'}
+
+
+def _unavailable_response(exc: VkAPIUnavailableError) -> JsonResponse:
+    retry_after = max(1, round(exc.retry_after))
+    return JsonResponse({'error': 'Service Unavailable'}, status=503, headers={'Retry-After': str(retry_after)})
+
+
 class GroupView(View):
 
     async def get(self, request, group_id, **kwargs):
         """Get vk group info."""
+        record_access(group_id)
         try:
             provider = VkGroupCompositeProvider()
-            group = await provider.get_by_id(group_id)
-            if group:
-                return JsonResponse(dict(group))
-            return JsonResponse({'error': 'Not Found'}, status=404)
+            response = await provider.get_response(group_id)
+            if response is None:
+                return JsonResponse({'error': 'Not Found'}, status=404)
+            is_stale = isinstance(response.group, StaleVkGroupSchema)
+            headers = get_cache_headers(response.etag, stale=is_stale)
+            if is_stale:
+                headers.update(STALE_HEADERS)
+            if is_not_modified(request.headers.get('If-None-Match'), response.etag):
+                return HttpResponseNotModified(headers=headers)
+            return HttpResponse(response.body, content_type='application/json', headers=headers)
+        except TooManyRequestsError as exc:
+            logger.warning(f'VK API rate limit in GroupView, {exc}')
+            return JsonResponse({'error': 'Service Unavailable'}, status=503, headers={'Retry-After': '1'})
+        except VkAPIUnavailableError as exc:
+            logger.warning(f'VK API is unavailable in GroupView, {exc}')
+            return _unavailable_response(exc)
         except Exception as exc:
             logger.error(f'Error in GroupView, {exc}')
             return JsonResponse({'error': 'Server Error'}, status=500)
 
+
+@method_decorator(csrf_exempt, name='dispatch')
+class GroupsView(View):
+
+    async def get(self, request, **kwargs):
+        """Get info of vk groups by comma separated ids in `ids` query param."""
+        try:
+            group_ids = [int(group_id) for group_id in request.GET.get('ids', '').split(',') if group_id]
+        except ValueError:
+            return JsonResponse({'error': 'ids must be comma separated integers'}, status=400)
+        return await self._get_groups(group_ids)
+
+    async def post(self, request, **kwargs):
+        """Get info of vk groups by list of ids in `ids` field of JSON body."""
+        try:
+            group_ids = json.loads(request.body).get('ids')
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'Body must be JSON object'}, status=400)
+        if not isinstance(group_ids, list) or not all(isinstance(group_id, int) for group_id in group_ids):
+            return JsonResponse({'error': 'ids must be list of integers'}, status=400)
+        return await self._get_groups(group_ids)
+
+    async def _get_groups(self, group_ids: list[int]):
+        if not group_ids:
+            return JsonResponse({'error': 'ids are required'}, status=400)
+        if len(group_ids) > settings.VK_GROUPS_REQUEST_MAX_IDS:
+            return JsonResponse({'error': f'Max {settings.VK_GROUPS_REQUEST_MAX_IDS} ids allowed'}, status=400)
+        for group_id in group_ids:
+            record_access(group_id)
+
+        try:
+            provider = VkGroupCompositeProvider()
+            groups = await provider.get_many(group_ids)
+        except TooManyRequestsError as exc:
+            logger.warning(f'VK API rate limit in GroupsView, {exc}')
+            return JsonResponse({'error': 'Service Unavailable'}, status=503, headers={'Retry-After': '1'})
+        except VkAPIUnavailableError as exc:
+            logger.warning(f'VK API is unavailable in GroupsView, {exc}')
+            return _unavailable_response(exc)
+        except Exception as exc:
+            logger.error(f'Error in GroupsView, {exc}')
+            return JsonResponse({'error': 'Server Error'}, status=500)
+
+        found = [dict(groups[group_id]) for group_id in dict.fromkeys(group_ids) if group_id in groups]
+        not_found = [group_id for group_id in dict.fromkeys(group_ids) if group_id not in groups]
+        is_stale = any(isinstance(group, StaleVkGroupSchema) for group in groups.values())
+        headers = STALE_HEADERS if is_stale else None
+        return JsonResponse({'groups': found, 'not_found': not_found}, headers=headers)
+
+
+class MetricsView(View):
+
+    def get(self, request, **kwargs):
+        """Get Prometheus metrics of all workers."""
+        if metrics.prometheus_client is None:
+            return JsonResponse({'error': 'prometheus_client is not installed'}, status=501)
+        content, content_type = metrics.generate_latest()
+        return HttpResponse(content, content_type=content_type)
@@ -1,7 +1,51 @@
+import asyncio
+import json
+from typing import Protocol
+
 import aiohttp
-from pydantic import ValidationError
 
-from vk_integration.shemas import VkGroupSchema
+from vk_integration.circuit_breaker import CircuitBreaker
+from vk_integration.metrics import vk_api_errors, vk_api_retries
+from vk_integration.shemas import VkGroupBatch, VkGroupSchema
+
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BACKGROUND = 'background'
+
+ERROR_TOO_MANY_REQUESTS = 6
+ERROR_INTERNAL_SERVER = 10
+ERROR_INVALID_PARAMETER = 100  # Returned for invalid group id
+
+EXECUTE_MAX_CALLS = 25  # Max API calls in code of one execute request
+
+
+class VkAPIError(Exception):
+    """Error in response from VK API."""
+
+    def __init__(self, message: str, code: int | None = None):
+        super().__init__(message)
+        self.code = code
+
+
+class TooManyRequestsError(VkAPIError):
+    """Request is not sent or rejected due to VK API rate limit."""
+
+    def __init__(self, message: str):
+        super().__init__(message, code=ERROR_TOO_MANY_REQUESTS)
+
+
+class VkAPIUnavailableError(VkAPIError):
+    """VK API doesn't respond in time or fails, or requests are not sent since circuit breaker is open."""
+
+    def __init__(self, message: str, code: int | None = None, retry_after: float = 0):
+        super().__init__(message, code=code)
+        self.retry_after = retry_after
+
+
+class RateLimiter(Protocol):
+
+    async def acquire(self, priority: str):
+        """Wait for permission to send request, raise TooManyRequestsError if can't wait."""
 
 
 class SingletonAPI(type):
@@ -19,41 +63,144 @@ class VkAPI(metaclass=SingletonAPI):
     api_version = 5.131
     api_base_url = 'https://api.vk.com/method'
 
-    def __init__(self, access_token: str):
+    def __init__(self, access_token: str, base_url: str | None = None, connection_limit: int = 100,
+                 connection_limit_per_host: int = 0, keepalive_timeout: float = 30, timeout: float | None = None,
+                 rate_limiter: RateLimiter | None = None, max_retries: int = 0, retry_backoff: float = 0.5,
+                 interactive_timeout: float | None = None, circuit_breaker: CircuitBreaker | None = None):
         """
         Initialization.
 
         :param access_token: VK API access token.
+        :param base_url: VK API base url. Default: https://api.vk.com/method.
+        :param connection_limit: Max number of open connections in the pool of each event loop.
+        :param connection_limit_per_host: Max number of open connections to the same host, 0 - no limit.
+        :param keepalive_timeout: Seconds to keep idle connection open for reuse.
+        :param timeout: Total timeout of request in seconds, None - no timeout.
+        :param rate_limiter: Limiter to wait for before each request.
+        :param max_retries: Number of retries of request rejected with "Too many requests per second" error.
+        :param retry_backoff: Delay before first retry in seconds, doubled for each next retry.
+        :param interactive_timeout: Total timeout of interactive request in seconds, None - same as timeout.
+        :param circuit_breaker: Breaker to stop requests while VK API is failing.
         """
         self.access_token = access_token
+        if base_url:
+            self.api_base_url = base_url
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.interactive_timeout = interactive_timeout
+        self.circuit_breaker = circuit_breaker
+        self._sessions: dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
 
-    def _get_session(self):
-        return aiohttp.ClientSession()
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Get connection-pooled session of the running event loop.
+
+        aiohttp session can't be shared between event loops, so each loop owns its session.
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            self._sessions = {
+                session_loop: loop_session for session_loop, loop_session in self._sessions.items()
+                if not session_loop.is_closed()
+            }
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._sessions[loop] = session
+        return session
+
+    async def close(self):
+        """Close session of the running event loop."""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
 
     def _get_auth_headers(self):
         return dict(
             Authorization=f"Bearer {self.access_token}"
         )
 
-    async def _make_request(self, url, params=None, headers=None):
+    async def _make_request(self, url, params=None, headers=None, priority: str = PRIORITY_INTERACTIVE, data=None):
         if not headers:
             headers = {}
         headers.update(self._get_auth_headers())
-        async with self._get_session() as session:
-            async with session.get(url, params=params, headers=headers) as resp:
-                response_data = await resp.json()
+        session = self._get_session()
+        request_options = dict(params=params, headers=headers)
+        if priority == PRIORITY_INTERACTIVE and self.interactive_timeout:
+            request_options['timeout'] = aiohttp.ClientTimeout(total=self.interactive_timeout)
+        attempt = 0
+        while True:
+            if self.circuit_breaker and not self.circuit_breaker.allow_request():
+                raise VkAPIUnavailableError(
+                    "VK API circuit breaker is open", retry_after=self.circuit_breaker.retry_after()
+                )
+            if self.rate_limiter:
+                await self.rate_limiter.acquire(priority)
+            try:
+                if data is None:
+                    request = session.get(url, **request_options)
+                else:
+                    request = session.post(url, data=data, **request_options)
+                async with request as resp:
+                    response_data = await resp.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+                if self.circuit_breaker:
+                    self.circuit_breaker.record_failure()
+                vk_api_errors.labels('unavailable').inc()
+                raise VkAPIUnavailableError(f"VK API is unavailable, {exc!r}") from exc
 
-        if not response_data.get('response') or response_data.get('error'):
-            raise ValidationError(f"Error in response from VK API {response_data}")
+            error = response_data.get('error')
+            if self.circuit_breaker:
+                if error and error.get('error_code') == ERROR_INTERNAL_SERVER:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success()
+            if error and error.get('error_code') == ERROR_TOO_MANY_REQUESTS:
+                if attempt >= self.max_retries:
+                    vk_api_errors.labels(ERROR_TOO_MANY_REQUESTS).inc()
+                    raise TooManyRequestsError(f"Error in response from VK API {response_data}")
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+                attempt += 1
+                vk_api_retries.inc()
+                continue
 
-        return response_data.get('response')
+            # Empty response is valid, e.g. groups.getById leaves out ids of groups which don't exist
+            if error or 'response' not in response_data:
+                vk_api_errors.labels(error.get('error_code') if error else 'empty').inc()
+                if error and error.get('error_code') == ERROR_INTERNAL_SERVER:
+                    raise VkAPIUnavailableError(
+                        f"Error in response from VK API {response_data}", code=ERROR_INTERNAL_SERVER
+                    )
+                raise VkAPIError(
+                    f"Error in response from VK API {response_data}",
+                    code=error.get('error_code') if error else None,
+                )
 
-    async def get_group_info(self, group_id: int, fields: str = 'id,members_count,name', **opts) -> VkGroupSchema:
+            return response_data.get('response')
+
+    async def get_group_info(self, group_id: int, fields: str = 'id,members_count,name',
+                             priority: str = PRIORITY_INTERACTIVE, include_deactivated: bool = True,
+                             **opts) -> VkGroupSchema | None:
         """
         Get VK group info.
 
         :param group_id: VK group ID.
         :param fields: Comma separated fields as string. Default: id,members_count,name.
+        :param priority: Priority of request for rate limiter.
+        :param include_deactivated: Return deleted and banned group, otherwise None is returned for it.
+        :return: Group, None if VK doesn't return it.
         """
         url = f"{self.api_base_url}/groups.getById"
         params = dict(
@@ -63,17 +210,26 @@ class VkAPI(metaclass=SingletonAPI):
         )
         params.update(opts)
 
-        resp_data = await self._make_request(url, params)
+        resp_data = await self._make_request(url, params, priority=priority)
 
+        if not resp_data:
+            return None
+        if not include_deactivated and resp_data[0].get('deactivated'):
+            return None
         return VkGroupSchema.from_response(resp_data[0])
 
-    async def get_group_batch_info(self, group_ids: list[int], fields: str = 'id,members_count,name', **opts
-                                   ) -> list[VkGroupSchema]:
+    async def get_group_batch_info(self, group_ids: list[int], fields: str = 'id,members_count,name',
+                                   priority: str = PRIORITY_INTERACTIVE, include_deactivated: bool = True,
+                                   columnar: bool = False, **opts) -> list[VkGroupSchema] | VkGroupBatch:
         """
         Get VK group info for list of groups.
 
         :param group_ids: List of VK group ID.
         :param fields: Comma separated fields as string. Default: id,members_count,name.
+        :param priority: Priority of request for rate limiter.
+        :param include_deactivated: Include deleted and banned groups.
+        :param columnar: Return groups as VkGroupBatch instead of list of schemas.
+        :return: Groups returned by VK, ids of groups which don't exist are left out.
         """
         url = f"{self.api_base_url}/groups.getById"
         params = dict(
@@ -83,8 +239,61 @@ class VkAPI(metaclass=SingletonAPI):
         )
         params.update(opts)
 
-        groups_data = await self._make_request(url, params)
+        groups_data = await self._make_request(url, params, priority=priority)
+
+        if columnar:
+            return VkGroupBatch.from_response(groups_data, include_deactivated)
+        return [
+            VkGroupSchema.from_response(group_data) for group_data in groups_data
+            if include_deactivated or not group_data.get('deactivated')
+        ]
+
+    async def execute(self, code: str, priority: str = PRIORITY_INTERACTIVE):
+        """
+        Run VKScript code in one request, up to EXECUTE_MAX_CALLS API calls.
+
+        Code is sent in request body, so it is not limited by max length of url.
+
+        :param code: VKScript code.
+        :param priority: Priority of request for rate limiter.
+        """
+        url = f"{self.api_base_url}/execute"
+        params = dict(v=self.api_version)
+        return await self._make_request(url, params, priority=priority, data=dict(code=code))
+
+    async def get_group_batches_info(self, batches: list[list[int]], fields: str = 'id,members_count,name',
+                                     priority: str = PRIORITY_INTERACTIVE, include_deactivated: bool = True,
+                                     columnar: bool = False) -> list[list[VkGroupSchema]] | list[VkGroupBatch]:
+        """
+        Get VK group info for several batches of groups with one execute request.
 
-        return [VkGroupSchema.from_response(group_data) for group_data in groups_data]
+        Batch failed inside execute, e.g. due to invalid group id, is returned empty.
 
+        :param batches: Up to EXECUTE_MAX_CALLS lists of VK group ID.
+        :param fields: Comma separated fields as string. Default: id,members_count,name.
+        :param priority: Priority of request for rate limiter.
+        :param include_deactivated: Include deleted and banned groups.
+        :param columnar: Return groups of each batch as VkGroupBatch instead of list of schemas.
+        """
+        if len(batches) > EXECUTE_MAX_CALLS:
+            raise ValueError(f"Max {EXECUTE_MAX_CALLS} batches allowed in one execute request")
+        calls = ','.join(
+            'API.groups.getById({})'.format(json.dumps(dict(
+                group_ids=','.join([str(g_id) for g_id in group_ids]),
+                fields=fields,
+            )))
+            for group_ids in batches
+        )
+        batches_data = await self.execute(f'return [{calls}];', priority=priority)
 
+        if columnar:
+            return [
+                VkGroupBatch.from_response(groups_data or [], include_deactivated) for groups_data in batches_data
+            ]
+        return [
+            [
+                VkGroupSchema.from_response(group_data) for group_data in groups_data or []
+                if include_deactivated or not group_data.get('deactivated')
+            ]
+            for groups_data in batches_data
+        ]